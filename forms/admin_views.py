@@ -1,15 +1,21 @@
-import base64
+import hashlib
+import io
 import re
+from collections import Counter
+from functools import partial
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
-from django.http import (Http404, HttpResponse, HttpResponseForbidden,
-                         HttpResponseRedirect)
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseForbidden, HttpResponseNotModified,
+                         HttpResponseRedirect, StreamingHttpResponse)
+from django.db.models import Prefetch
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from django.utils import timezone
 from django.utils.functional import cached_property
+from django.utils.http import parse_etags, quote_etag, urlencode
 from django.utils.translation import gettext as _
 from django.views.generic import (CreateView, DeleteView, DetailView, ListView,
                                   TemplateView, UpdateView)
@@ -17,11 +23,16 @@ from django.views.generic.base import ContextMixin
 from guardian.decorators import permission_required
 from guardian.mixins import PermissionRequiredMixin
 from guardian.shortcuts import get_objects_for_user
-from jsonschema import FormatChecker, ValidationError, validate
+from jsonschema import ValidationError
 
+from forms.attachments import PREVIEW_SIZES, get_preview, parse_data_url
 from forms.forms import CommentDeleteForm, CommentForm
-from forms.models import Comment, Form, FormResponse, Investigation, Tag, User
-from forms.utils import create_form_csv
+from forms.models import (Attachment, Comment, Form, FormResponse,
+                          Investigation, Tag, User)
+from forms.pagination import KeysetPaginator, count
+from forms.utils import iter_form_csv
+
+FILE_CHUNK_SIZE = 64 * 1024
 
 
 def _get_filter_params(kwargs, get_params):
@@ -54,6 +65,55 @@ def _get_filter_params(kwargs, get_params):
     return filter_params
 
 
+def _get_api_filter_params(get_params):
+    """ `_get_filter_params` for the API, which like `FormResponseList`
+    covers the responses of all buckets unless asked for a bucket or status """
+    filter_params = _get_filter_params({"bucket": get_params.get("bucket")}, get_params)
+    if not get_params.get("bucket"):
+        del filter_params["status"]
+    if get_params.get("status"):
+        filter_params["status"] = get_params.get("status")
+    return filter_params
+
+
+def _sum_counts(counts_by_status):
+    total = Counter()
+    for counts in counts_by_status.values():
+        total.update(counts)
+    return dict(total)
+
+
+def count_facets(form, filter_params, search=None):
+    """ the number of responses per status for `filter_params` and per
+    tag and assignee in their status, or in all of them if they have none """
+    filter_params = dict(filter_params)
+    status = filter_params.pop("status", None)
+    if filter_params or search:
+        form_responses = FormResponse.objects.filter(form=form, **filter_params)
+        if search:
+            form_responses = form_responses.search(search, form.language)
+        facets = form_responses.facets()
+    else:
+        facets = form.facet_counts()
+    if status is None:
+        return {
+            "status": facets["status"],
+            "tags": _sum_counts(facets["tags"]),
+            "assignees": _sum_counts(facets["assignees"]),
+        }
+    return {
+        "status": facets["status"],
+        "tags": facets["tags"].get(status, {}),
+        "assignees": facets["assignees"].get(status, {}),
+    }
+
+
+def get_facets(form, kwargs, get_params):
+    """ the number of responses per status for the filters in `get_params`
+    and per tag and assignee in the current bucket """
+    return count_facets(form, _get_filter_params(kwargs, get_params), get_params.get("q"))
+
+
 class BreadCrumbMixin(ContextMixin):
     def get_breadcrumbs(self):
         return []
@@ -71,7 +131,8 @@ class InvestigationListView(LoginRequiredMixin, BreadCrumbMixin, ListView):
         ]
 
     def get_queryset(self):
-        return get_objects_for_user(self.request.user, 'view_investigation', Investigation)
+        investigations = get_objects_for_user(self.request.user, 'view_investigation', Investigation)
+        return Investigation.with_submission_stats(investigations)
 
 
 class InvestigationAuthMixin(PermissionRequiredMixin, LoginRequiredMixin):
@@ -144,21 +205,48 @@ class FormResponseListView(InvestigationAuthMixin, BreadCrumbMixin, ListView):
         filter_params = _get_filter_params(self.kwargs, self.request.GET)
         investigation_responses = investigation_responses.filter(
             **filter_params)
+        search = self.request.GET.get("q")
+        if search:
+            investigation_responses = investigation_responses.search(search, self.form.language)
+        image_attachments = Attachment.objects.filter(content_type__startswith="image/")
         investigation_responses = investigation_responses \
+            .annotate(inbox_date=Coalesce('last_status_changed_date', 'submission_date')) \
             .prefetch_related("tags") \
-            .prefetch_related("assignees")
+            .prefetch_related("assignees") \
+            .prefetch_related(Prefetch("attachments", queryset=image_attachments,
+                                       to_attr="image_attachments"))
         return investigation_responses
 
-    def _get_message(self):
-        if sum(self.form.count_by_bucket().values()) == 0:
-            return _("No one contributed to your investigation yet. Time to advertise!")
+    def paginate_queryset(self, queryset, page_size):
+        # search results are ordered by relevance instead
+        sort_key = "search_rank" if self.request.GET.get("q") else "inbox_date"
+        paginator = KeysetPaginator(queryset, sort_key, page_size)
+        try:
+            page = paginator.page(after=self.request.GET.get("after"),
+                                  before=self.request.GET.get("before"))
+        except ValueError:
+            raise Http404()
+        return paginator, page, page.object_list, page.has_next or page.has_previous
 
+    def _is_filtered(self):
         active_filters = [key for key,
                           value in self.request.GET.items() if value]
-        is_filtered = {'has', 'tag', 'email',
-                       'assignee'}.intersection(active_filters)
+        return bool({'has', 'tag', 'email',
+                     'assignee', 'q'}.intersection(active_filters))
 
-        if is_filtered:
+    def _get_count(self):
+        """ the number of responses in the current view and whether it is exact """
+        if not self._is_filtered():
+            # whole buckets are counted already
+            status = _get_filter_params(self.kwargs, {})["status"]
+            return self.form.count_by_bucket().get(status, 0), True
+        return count(self.object_list)
+
+    def _get_message(self):
+        if sum(self.form.count_by_bucket().values()) == 0:
+            return _("No one contributed to your investigation yet. Time to advertise!")
+
+        if self._is_filtered():
             return _("There are no results using your current filters. Maybe try something else?")
 
         if not self.kwargs.get("bucket") == "inbox":
@@ -172,12 +260,12 @@ class FormResponseListView(InvestigationAuthMixin, BreadCrumbMixin, ListView):
         context['investigation'] = self.investigation
         context['form'] = self.form
 
-        allowed_params = ['has', 'tag', 'email', 'assignee']
+        allowed_params = ['has', 'tag', 'email', 'assignee', 'q']
 
-        context['query_params'] = '&'.join(['{}={}'.format(k, v)
-                                            for k, v
-                                            in self.request.GET.items()
-                                            if k in allowed_params])
+        context['query_params'] = urlencode([(k, v)
+                                             for k, v
+                                             in self.request.GET.items()
+                                             if k in allowed_params])
         for param in allowed_params:
             value = self.request.GET.get(param)
             context['{}_param'.format(param)] = value
@@ -185,6 +273,9 @@ class FormResponseListView(InvestigationAuthMixin, BreadCrumbMixin, ListView):
                 context['has_filters'] = True
 
         context['empty_message'] = self._get_message()
+        context['facets'] = get_facets(self.form, self.kwargs, self.request.GET)
+        if context['is_paginated']:
+            context['total_count'], context['count_is_exact'] = self._get_count()
 
         csv_base = reverse("form_responses_csv", kwargs={
             "investigation_slug": self.investigation.slug,
@@ -223,6 +314,7 @@ class FormResponseDetailView(InvestigationAuthMixin, BreadCrumbMixin, DetailView
         context = super().get_context_data(**kwargs)
         context['comment_form'] = CommentForm()
         context['investigation'] = self.investigation
+        context['image_attachments'] = self.object.image_attachments_by_json_name()
         return context
 
     def get_breadcrumbs(self):
@@ -295,8 +387,7 @@ def form_response_batch_edit(request, *args, **kwargs):
     # make sure that we only edit responses that user is allowed to edit
     investigation = Investigation.objects.get(
         slug=kwargs["investigation_slug"])
-    form_responses = FormResponse.objects.filter(id__in=ids,
-                                                 form_instance__form__investigation=investigation)
+    form_responses = FormResponse.objects.filter(id__in=ids, investigation=investigation)
 
     # update tags for all selected form responses
     try:
@@ -329,14 +420,11 @@ def form_response_batch_edit(request, *args, **kwargs):
 
     # update status for all selected form responses
     if action == "mark_invalid":
-        form_responses.update(status="I")
-        form_responses.update(last_status_changed_date=timezone.now())
+        form_responses.set_status("I")
     elif action == "mark_submitted":
-        form_responses.update(status="S")
-        form_responses.update(last_status_changed_date=timezone.now())
+        form_responses.set_status("S")
     elif action == "mark_verified":
-        form_responses.update(status="V")
-        form_responses.update(last_status_changed_date=timezone.now())
+        form_responses.set_status("V")
 
     return HttpResponseRedirect(reverse("form_responses", kwargs={"investigation_slug": kwargs["investigation_slug"],
                                                                   "form_slug": kwargs["form_slug"],
@@ -355,37 +443,23 @@ def form_response_csv_view(request, *args, **kwargs):
 
     filter_params = _get_filter_params(kwargs, request.GET)
 
-    response = HttpResponse(content_type='text/csv')
+    lines = iter_form_csv(form, investigation_slug,
+                          request.build_absolute_uri, filter_params)
+    response = StreamingHttpResponse(lines, content_type='text/csv')
     filename = 'crowdnewsroom_download_{}_{}.csv'.format(
         investigation_slug, form_slug)
     response['Content-Disposition'] = 'attachment; filename="{}"'.format(
         filename)
 
-    create_form_csv(form, investigation_slug,
-                    request.build_absolute_uri, response, filter_params)
-
     return response
 
 
 def _get_file_data(file):
     try:
-        header, content = file.split(";base64,")
-        if ";name=" in header:
-            file_type, filename = header.split(";name=")
-        # TODO: It is probably not safe here to assume that this is
-        # always going to be a signature. Maybe check the uiSchema
-        # to make sure.
-        else:
-            file_type = header
-            filename = "signature.png"
+        return parse_data_url(file)
     except ValueError:
         raise Http404()
 
-    file_type = file_type.replace("data:", "")
-
-    file_content = base64.b64decode(content)
-    return filename, file_type, file_content
-
 
 @login_required(login_url="/admin/login")
 @permission_required('forms.view_investigation', (Investigation, 'slug', 'investigation_slug'), return_403=True)
@@ -398,7 +472,7 @@ def form_response_file_view(request, *args, **kwargs):
 
     form = get_object_or_404(Form, slug=form_slug)
     form_response = get_object_or_404(FormResponse, id=response_id)
-    if form.investigation.slug != investigation_slug or form_response.form_instance.form != form:
+    if form.investigation.slug != investigation_slug or form_response.form_id != form.id:
         return HttpResponseForbidden()
 
     file = form_response.json.get(file_field)
@@ -410,13 +484,124 @@ def form_response_file_view(request, *args, **kwargs):
             raise Http404
         file = file[file_index]
 
+    if Attachment.is_reference(file):
+        attachment = Attachment.get_for_reference(form_response, file)
+        if attachment is None:
+            raise Http404()
+        return _attachment_response(request, form_response, attachment)
+
     filename, file_type, file_content = _get_file_data(file)
+    digest = hashlib.sha256(file_content).hexdigest()
+    response = _file_response(request, partial(io.BytesIO, file_content),
+                              len(file_content), digest, file_type)
+    response['Content-Disposition'] = 'inline; filename="{}-{}"'.format(
+        form_response.id, filename)
+    return response
+
+
+@login_required(login_url="/admin/login")
+@permission_required('forms.view_investigation', (Investigation, 'slug', 'investigation_slug'), return_403=True)
+def form_response_attachment_view(request, *args, **kwargs):
+    form = get_object_or_404(Form, slug=kwargs.get("form_slug"))
+    form_response = get_object_or_404(FormResponse, id=kwargs.get("response_id"))
+    if form.investigation.slug != kwargs.get("investigation_slug") or form_response.form_id != form.id:
+        return HttpResponseForbidden()
+
+    attachment = get_object_or_404(Attachment.objects.select_related("blob"),
+                                   id=kwargs.get("attachment_id"),
+                                   form_response=form_response)
+    return _attachment_response(request, form_response, attachment)
+
+
+def _attachment_response(request, form_response, attachment):
+    """ serves an attachment, or a preview of it if the `size`
+    query parameter names one of `PREVIEW_SIZES` """
+    size = request.GET.get("size")
+    if size and size not in PREVIEW_SIZES:
+        return HttpResponse(status=400)
+
+    preview = get_preview(attachment, size) if size and attachment.is_image else None
+    if preview:
+        filename = "{}-{}".format(size, attachment.filename)
+        response = _file_response(request, partial(preview.file.open, "rb"), preview.file_size,
+                                  "{}-{}".format(attachment.blob.sha256, size), preview.content_type)
+    else:
+        filename = attachment.filename
+        response = _file_response(request, partial(attachment.file.open, "rb"), attachment.size,
+                                  attachment.blob.sha256, attachment.content_type)
+
+    response['Content-Disposition'] = 'inline; filename="{}-{}"'.format(
+        form_response.id, filename)
+    return response
+
 
-    prefixed_filename = "{}-{}".format(form_response.id, filename)
-    response = HttpResponse(content_type=file_type)
-    response.write(file_content)
-    response['Content-Disposition'] = 'inline; filename="{}"'.format(
-        prefixed_filename)
+def _parse_range(range_header, size):
+    """ returns (first byte, last byte) of a single "bytes=" range,
+    None if the header does not describe one we understand and
+    a ValueError if it can not be satisfied """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if not start:
+        # suffix range, e.g. "bytes=-500" for the last 500 bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), (min(int(end), size - 1) if end else size - 1)
+
+    if start >= size or start > end:
+        raise ValueError(range_header)
+    return start, end
+
+
+def _iter_range(file, start, length, chunk_size=FILE_CHUNK_SIZE):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _file_response(request, open_file, size, digest, content_type):
+    """ streams a file with a strong ETag based on its content hash,
+    answering conditional and range requests """
+    etag = quote_etag(digest)
+    if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    if etag in if_none_match or "*" in if_none_match:
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    byte_range = None
+    range_header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = "bytes */{}".format(size)
+            return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_iter_range(open_file(), start, end - start + 1),
+                                         status=206, content_type=content_type)
+        response["Content-Range"] = "bytes {}-{}/{}".format(start, end, size)
+        response["Content-Length"] = end - start + 1
+    else:
+        response = FileResponse(open_file(), content_type=content_type)
+        response.block_size = FILE_CHUNK_SIZE
+        response["Content-Length"] = size
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    # the files are only visible to members of the investigation
+    response["Cache-Control"] = "private, no-cache"
     return response
 
 
@@ -441,9 +626,7 @@ def form_response_json_edit_view(request, *args, **kwargs):
             if json_key not in form_response.valid_keys:
                 return HttpResponse(status=400)
             try:
-                validate({json_key: value},
-                         form_response.form_instance.flat_schema,
-                         format_checker=FormatChecker())
+                form_response.form_instance.schema_validator.validate({json_key: value})
             except ValidationError as e:
                 return HttpResponse(e.message, status=400)
 
@@ -0,0 +1,142 @@
+import base64
+import io
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from PIL import Image, ImageOps
+
+from forms.models import FIELD_KINDS, Attachment, AttachmentPreview
+
+# longest edge in pixels
+PREVIEW_SIZES = {
+    "thumbnail": 160,
+    "preview": 1024,
+}
+
+
+def is_data_url(value):
+    return isinstance(value, str) and value.startswith("data:") and ";base64," in value
+
+
+def parse_data_url(data_url):
+    """ returns filename, content type and the decoded content of a
+    data-url, raises a ValueError if it cannot be parsed"""
+    header, content = data_url.split(";base64,")
+    if ";name=" in header:
+        file_type, filename = header.split(";name=")
+    # TODO: It is probably not safe here to assume that this is
+    # always going to be a signature. Maybe check the uiSchema
+    # to make sure.
+    else:
+        file_type = header
+        filename = "signature.png"
+
+    file_type = file_type.replace("data:", "")
+
+    file_content = base64.b64decode(content)
+    return filename, file_type, file_content
+
+
+def _make_attachment(data_url):
+    try:
+        filename, file_type, file_content = parse_data_url(data_url)
+    except ValueError:
+        return None
+    attachment = Attachment()
+    attachment.set_content(filename, file_type, file_content)
+    return attachment
+
+
+def extract_attachments(form_response):
+    """
+    Replaces all files that are stored as data-urls in the response's
+    JSON with references to new attachments and returns those. The
+    attachments still need to be saved once the response is.
+    Legacy responses whose JSON is not an object have no fields to
+    look at and are left alone.
+    """
+    if not isinstance(form_response.json, dict):
+        return []
+    json = dict(form_response.json)
+    attachments = []
+
+    def extract(value):
+        if not is_data_url(value):
+            return value
+        attachment = _make_attachment(value)
+        if attachment is None:
+            return value
+        attachments.append(attachment)
+        return attachment.reference
+
+    for field in form_response.form_instance.render_plan:
+        value = json.get(field.name)
+        if field.kind == FIELD_KINDS.FILE:
+            json[field.name] = extract(value)
+        elif field.kind == FIELD_KINDS.FILE_ARRAY and isinstance(value, list):
+            json[field.name] = [extract(part) for part in value]
+
+    if attachments:
+        form_response.json = json
+    return attachments
+
+
+def save_with_attachments(form_response, **kwargs):
+    """ saves a response after moving its files out of the JSON """
+    with transaction.atomic():
+        attachments = extract_attachments(form_response)
+        form_response.save(**kwargs)
+        for attachment in attachments:
+            attachment.form_response = form_response
+            attachment.save()
+    return attachments
+
+
+def _render_preview(file, max_edge):
+    image = Image.open(file)
+    image.load()
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_edge, max_edge))
+
+    # keep transparency, e.g. for signatures
+    if image.mode in ("RGBA", "LA", "P"):
+        image_format, content_type = "PNG", "image/png"
+    else:
+        image_format, content_type = "JPEG", "image/jpeg"
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    image.save(output, image_format)
+    return output.getvalue(), content_type, image.size
+
+
+def get_preview(attachment, size):
+    """
+    Returns the scaled down version of an image attachment, it is
+    created the first time it is asked for and shared by all
+    attachments with the same content. Returns None for files that
+    Pillow cannot read.
+    """
+    blob = attachment.blob
+    preview = blob.previews.filter(size=size).first()
+    if preview:
+        return preview
+
+    try:
+        with blob.file.open("rb") as file:
+            content, content_type, (width, height) = _render_preview(file, PREVIEW_SIZES[size])
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        return None
+
+    preview = AttachmentPreview(blob=blob, size=size, content_type=content_type,
+                                width=width, height=height, file_size=len(content))
+    extension = ".png" if content_type == "image/png" else ".jpg"
+    preview.file.save("{}-{}{}".format(blob.sha256, size, extension), ContentFile(content), save=False)
+    try:
+        with transaction.atomic():
+            preview.save()
+    except IntegrityError:
+        # another request rendered the same preview in the meantime
+        preview.file.delete(save=False)
+        preview = blob.previews.get(size=size)
+    return preview
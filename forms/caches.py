@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import get_language
+
+
+class FormInstanceCache(object):
+    """
+    In-process LRU cache for values that are derived from a FormInstance
+    and stay the same for all of its responses.
+
+    Entries are keyed by the instance's id and the time it was last saved,
+    so other processes pick up changes as soon as they load the instance
+    again. The receivers for FormInstance in `forms.models` drop outdated
+    entries of the process that saved it right away, in all others they
+    are pushed out by newer ones.
+    """
+    registry = []
+
+    def __init__(self, build, maxsize=256):
+        self.build = build
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        FormInstanceCache.registry.append(self)
+
+    def get(self, form_instance):
+        if form_instance.pk is None:
+            return self.build(form_instance)
+
+        key = (form_instance.pk, form_instance.last_changed_date)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = self.build(form_instance)
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, form_instance_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == form_instance_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @classmethod
+    def invalidate_all(cls, form_instance_id):
+        for instance_cache in cls.registry:
+            instance_cache.invalidate(form_instance_id)
+
+
+class ObjectCache(object):
+    """
+    Values derived from a model instance that are expensive to work out
+    and are read on every page load, kept in Django's cache framework.
+
+    Entries are dropped by receivers in `forms.models` whenever what they
+    are derived from changes. The timeout limits how stale they can get
+    in other processes if the configured cache backend is not shared.
+    """
+
+    def __init__(self, name, build, timeout=300):
+        self.name = name
+        self.build = build
+        self.timeout = timeout
+
+    def key(self, pk):
+        return "forms:{}:{}".format(self.name, pk)
+
+    def get(self, obj):
+        if obj.pk is None:
+            return self.build(obj)
+
+        value = cache.get(self.key(obj.pk))
+        if value is None:
+            value = self.build(obj)
+            cache.set(self.key(obj.pk), value, self.timeout)
+        return value
+
+    def invalidate(self, *pks):
+        keys = [self.key(pk) for pk in pks]
+        cache.delete_many(keys)
+        # other processes might fill them again with what they see before
+        # the changes are committed, so drop them once more when they are
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class PayloadCache(object):
+    """
+    Rendered bodies of public endpoints kept in Django's cache framework,
+    per key (e.g. a slug) and language as they can contain translations.
+
+    Like `ObjectCache`, entries are dropped by receivers in `forms.models`
+    and the timeout limits how stale other processes can get.
+    """
+
+    def __init__(self, name, timeout=300):
+        self.name = name
+        self.timeout = timeout
+
+    def key(self, key, language):
+        return "forms:{}:{}:{}".format(self.name, key, language)
+
+    def get(self, key, build):
+        cache_key = self.key(key, get_language())
+        value = cache.get(cache_key)
+        if value is None:
+            value = build()
+            cache.set(cache_key, value, self.timeout)
+        return value
+
+    def invalidate(self, *keys):
+        languages = {code for code, name in settings.LANGUAGES} | {settings.LANGUAGE_CODE}
+        cache_keys = [self.key(key, language) for key in keys for language in languages]
+        cache.delete_many(cache_keys)
+        # see `ObjectCache.invalidate`
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
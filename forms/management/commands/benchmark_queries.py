@@ -0,0 +1,115 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from forms.admin_views import _get_filter_params
+from forms.models import Form, FormResponse
+from forms.pagination import KeysetPaginator, encode_cursor
+
+PAGE_SIZE = 25
+
+
+def _inbox(form):
+    return FormResponse.get_all_for_form(form) \
+        .filter(status="S") \
+        .annotate(inbox_date=Coalesce('last_status_changed_date', 'submission_date'))
+
+
+def inbox_first_page(form):
+    return _inbox(form).order_by("-inbox_date", "-id")[:PAGE_SIZE + 1]
+
+
+def inbox_middle_page(form):
+    inbox = _inbox(form)
+    middle = inbox.order_by("-inbox_date", "-id")[inbox.count() // 2:].first()
+    cursor = encode_cursor(middle.inbox_date, middle.pk) if middle else None
+    return KeysetPaginator(inbox, "inbox_date", PAGE_SIZE).after(cursor)
+
+
+def form_instance_inbox(form):
+    form_instance = form.forminstance_set.order_by("-version").first()
+    return FormResponse.objects \
+        .filter(form_instance=form_instance, status="S") \
+        .order_by(Coalesce('last_status_changed_date', 'submission_date').desc())[:PAGE_SIZE]
+
+
+def _filtered_inbox(form, get_params):
+    filter_params = _get_filter_params({"bucket": "inbox"}, get_params)
+    return FormResponse.get_all_for_form(form).filter(**filter_params)[:PAGE_SIZE + 1]
+
+
+def email_search(form):
+    # part of an address that is actually there, as typed in the search box
+    latest = FormResponse.objects.filter(form=form).order_by("-id").first()
+    email = latest.json_email if latest else ""
+    return _filtered_inbox(form, {"email": email.split("@")[0][-5:] or "@"})
+
+
+def has_field(form):
+    latest = FormResponse.objects.filter(form=form).order_by("-id").first()
+    key = next(iter(sorted(latest.json)), "") if latest else ""
+    return _filtered_inbox(form, {"has": key or "email"})
+
+
+QUERIES = {
+    "inbox_first_page": inbox_first_page,
+    "inbox_middle_page": inbox_middle_page,
+    "email_search": email_search,
+    "has_field": has_field,
+    "form_instance_inbox": form_instance_inbox,
+}
+
+
+class Command(BaseCommand):
+    help = 'Show the query plans and timings of the hot response queries for a form'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--form',
+            help='Slug of the form to use, defaults to the one with the most responses'
+        )
+        parser.add_argument(
+            '--query',
+            action='append',
+            choices=sorted(QUERIES),
+            help='Only run this query, can be given more than once'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='How often to run each query for the timings'
+        )
+
+    def _get_form(self, slug):
+        if slug:
+            try:
+                return Form.objects.get(slug=slug)
+            except Form.DoesNotExist:
+                raise CommandError("There is no form '{}'".format(slug))
+        form = Form.objects \
+            .annotate(total=Sum("submission_counts__count")) \
+            .order_by(Coalesce("total", 0).desc()) \
+            .first()
+        if form is None:
+            raise CommandError("There are no forms yet")
+        return form
+
+    def handle(self, *args, **options):
+        form = self._get_form(options['form'])
+        self.stdout.write("Form '{}'".format(form.slug))
+
+        for name in options['query'] or sorted(QUERIES):
+            queryset = QUERIES[name](form)
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write("\n{}: median {:.2f} ms, min {:.2f} ms".format(
+                name, statistics.median(timings), min(timings)))
+            self.stdout.write(queryset.explain(analyze=True, buffers=True))
@@ -0,0 +1,73 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from forms.models import AttachmentBlob, AttachmentPreview
+
+
+def stray_files(model, cutoff):
+    """ files in the upload directory of `model` that no row points to,
+    e.g. because the transaction that stored them was rolled back """
+    field = model._meta.get_field("file")
+    directory = field.upload_to.rstrip("/")
+    try:
+        _, filenames = field.storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    known = set(model.objects.values_list("file", flat=True))
+    for filename in filenames:
+        name = posixpath.join(directory, filename)
+        if name not in known and field.storage.get_modified_time(name) < cutoff:
+            yield field.storage, name
+
+
+class Command(BaseCommand):
+    help = 'Delete stored files that no attachment points to anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=1,
+            help='Only delete files that were stored at least this many hours ago'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the files that would be deleted'
+        )
+
+    def handle(self, *args, **options):
+        min_age = timedelta(hours=options['min_age'])
+        orphans = AttachmentBlob.orphans(min_age=min_age)
+
+        deleted = 0
+        freed = 0
+        for blob in list(orphans):
+            if not options['dry_run']:
+                # deleting one by one removes the files from storage as well
+                with transaction.atomic():
+                    blob = AttachmentBlob.objects.select_for_update().get(id=blob.id)
+                    if blob.attachments.exists():
+                        # the file was uploaded again in the meantime
+                        continue
+                    blob.delete()
+            deleted += 1
+            freed += blob.size
+
+        # the file is stored before the row is committed, younger files
+        # might still be about to get one
+        cutoff = timezone.now() - min_age
+        for model in (AttachmentBlob, AttachmentPreview):
+            for storage, name in stray_files(model, cutoff):
+                size = storage.size(name)
+                if not options['dry_run']:
+                    storage.delete(name)
+                deleted += 1
+                freed += size
+
+        self.stdout.write("{} {} files ({} bytes)".format(
+            "Would delete" if options['dry_run'] else "Deleted", deleted, freed))
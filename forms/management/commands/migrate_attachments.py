@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import TextField
+from django.db.models.functions import Cast
+
+from forms.attachments import save_with_attachments
+from forms.models import FormResponse
+
+
+class Command(BaseCommand):
+    help = 'Move files that are stored inline in FormResponse.json into attachments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of responses to load per query, each response is migrated in its own transaction'
+        )
+
+    def handle(self, *args, **options):
+        candidates = FormResponse.objects \
+            .annotate(json_text=Cast("json", TextField())) \
+            .filter(json_text__contains=";base64,") \
+            .order_by("id")
+
+        last_id = 0
+        migrated = 0
+        skipped = 0
+        while True:
+            ids = list(candidates.filter(id__gt=last_id)
+                       .values_list("id", flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            form_responses = FormResponse.objects \
+                .filter(id__in=ids) \
+                .select_related("form_instance")
+            for form_response in form_responses:
+                if not isinstance(form_response.json, dict):
+                    self.stderr.write("Skipped response {}, its JSON is not an object".format(form_response.id))
+                    skipped += 1
+                    continue
+                if save_with_attachments(form_response, update_fields=["json"]):
+                    migrated += 1
+
+            self.stdout.write("Checked responses up to {}".format(last_id))
+
+        self.stdout.write("Moved files of {} responses into attachments, skipped {}".format(migrated, skipped))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from forms.models import FormResponse
+from forms.utils import EXPORT_CHUNK_SIZE, _chunked
+
+
+class Command(BaseCommand):
+    help = 'Index the text answers of responses for full-text search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Reindex all responses instead of only the ones that were never indexed'
+        )
+
+    def handle(self, *args, **options):
+        responses = FormResponse.objects.all()
+        if not options['all']:
+            responses = responses.filter(search_vector__isnull=True)
+        responses = responses \
+            .select_related("form_instance__form") \
+            .order_by("id") \
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        indexed = 0
+        for chunk in _chunked(responses, EXPORT_CHUNK_SIZE):
+            # not a change reviewers need to know about, so nothing is touched
+            with transaction.atomic():
+                for form_response in chunk:
+                    FormResponse.objects \
+                        .filter(id=form_response.id) \
+                        .update(search_vector=form_response.get_search_vector())
+            indexed += len(chunk)
+
+        self.stdout.write("Indexed {} responses".format(indexed))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from forms.models import SubmissionCount
+
+
+class Command(BaseCommand):
+    help = 'Recount the submissions per form, day and status from scratch'
+
+    def handle(self, *args, **options):
+        SubmissionCount.rebuild()
+        self.stdout.write("Rebuilt {} submission counts".format(SubmissionCount.objects.count()))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forms.models import ExportJob
+from forms.utils import run_export_job
+
+
+class Command(BaseCommand):
+    help = 'Build the files for pending CSV exports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once there are no pending exports left instead of waiting for new ones'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait before looking for new exports again'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = ExportJob.claim_next()
+            if job:
+                self.stdout.write("Building export {} for {}".format(job.id, job.form))
+                run_export_job(job)
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
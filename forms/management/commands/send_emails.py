@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forms.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    help = 'Send the emails that are waiting in the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once there are no emails due instead of waiting for new ones'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait before looking for new emails again'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='How many emails to take from the outbox at a time'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent = OutgoingEmail.send_pending(options['batch_size'])
+            except OSError as e:
+                # the mail server cannot be reached, the emails stay pending
+                self.stderr.write("Could not connect to the mail server: {}".format(e))
+                sent = 0
+            if sent:
+                self.stdout.write("Handled {} emails".format(sent))
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
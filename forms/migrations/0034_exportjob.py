@@ -0,0 +1,38 @@
+# Generated by Django 2.2.9 on 2026-10-18 12:05
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0033_auto_20200121_0935'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formresponse',
+            name='last_changed_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter_params', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict)),
+                ('base_url', models.TextField()),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('R', 'Running'), ('F', 'Finished'), ('E', 'Failed')], default='P', max_length=1)),
+                ('progress', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('file', models.FileField(blank=True, null=True, upload_to='exports/')),
+                ('fingerprint', models.CharField(blank=True, max_length=100)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('finished_date', models.DateTimeField(blank=True, null=True)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='forms.Form')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
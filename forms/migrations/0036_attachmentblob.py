@@ -0,0 +1,59 @@
+# Generated by Django 2.2.9 on 2026-10-18 13:20
+
+import hashlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_files_to_blobs(apps, schema_editor):
+    Attachment = apps.get_model('forms', 'Attachment')
+    AttachmentBlob = apps.get_model('forms', 'AttachmentBlob')
+
+    for attachment in Attachment.objects.filter(blob__isnull=True).iterator():
+        with attachment.file.open("rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+
+        blob = AttachmentBlob.objects.filter(sha256=digest).first()
+        if blob is None:
+            blob = AttachmentBlob.objects.create(sha256=digest, file=attachment.file.name,
+                                                 size=attachment.size)
+        else:
+            attachment.file.delete(save=False)
+        attachment.blob = blob
+        attachment.save(update_fields=["blob"])
+
+
+def move_blobs_to_files(apps, schema_editor):
+    Attachment = apps.get_model('forms', 'Attachment')
+
+    for attachment in Attachment.objects.select_related("blob").iterator():
+        attachment.file = attachment.blob.file.name
+        attachment.size = attachment.blob.size
+        attachment.save(update_fields=["file", "size"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0035_attachment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(upload_to='attachments/')),
+                ('size', models.BigIntegerField(default=0)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attachments', to='forms.AttachmentBlob'),
+        ),
+        migrations.RunPython(move_files_to_blobs, move_blobs_to_files),
+    ]
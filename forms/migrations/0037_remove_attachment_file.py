@@ -0,0 +1,27 @@
+# Generated by Django 2.2.9 on 2026-10-18 13:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0036_attachmentblob'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='attachment',
+            name='file',
+        ),
+        migrations.RemoveField(
+            model_name='attachment',
+            name='size',
+        ),
+        migrations.AlterField(
+            model_name='attachment',
+            name='blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='attachments', to='forms.AttachmentBlob'),
+        ),
+    ]
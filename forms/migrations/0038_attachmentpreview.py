@@ -0,0 +1,30 @@
+# Generated by Django 2.2.9 on 2026-10-18 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0037_remove_attachment_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentPreview',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(max_length=20)),
+                ('file', models.FileField(upload_to='attachments/previews/')),
+                ('file_size', models.BigIntegerField(default=0)),
+                ('content_type', models.CharField(max_length=255)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='previews', to='forms.AttachmentBlob')),
+            ],
+            options={
+                'unique_together': {('blob', 'size')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.9 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0038_attachmentpreview'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE SEQUENCE forms_formresponse_change_seq",
+            "DROP SEQUENCE forms_formresponse_change_seq",
+        ),
+        migrations.AddField(
+            model_name='formresponse',
+            name='change_sequence',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='formresponse',
+            name='change_transaction',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        # existing responses are numbered in the order they last changed
+        migrations.RunSQL(
+            """
+            UPDATE forms_formresponse
+            SET change_sequence = ordered.change_sequence
+            FROM (
+                SELECT id, nextval('forms_formresponse_change_seq') AS change_sequence
+                FROM (SELECT id FROM forms_formresponse ORDER BY last_changed_date, id) AS responses
+            ) AS ordered
+            WHERE forms_formresponse.id = ordered.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.9 on 2026-10-18 16:02
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def count_submissions(apps, schema_editor):
+    FormResponse = apps.get_model('forms', 'FormResponse')
+    SubmissionCount = apps.get_model('forms', 'SubmissionCount')
+
+    groups = FormResponse.objects \
+        .annotate(date=TruncDate("submission_date")) \
+        .values("form_instance__form_id", "date", "status") \
+        .annotate(total=Count("id")) \
+        .order_by()
+    SubmissionCount.objects.bulk_create(SubmissionCount(form_id=group["form_instance__form_id"],
+                                                        date=group["date"],
+                                                        status=group["status"],
+                                                        count=group["total"])
+                                        for group in groups)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0039_formresponse_change_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('S', 'Submitted'), ('V', 'Verified'), ('I', 'Invalid')], max_length=1)),
+                ('count', models.IntegerField(default=0)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_counts', to='forms.Form')),
+            ],
+            options={
+                'unique_together': {('form', 'date', 'status')},
+            },
+        ),
+        migrations.RunPython(count_submissions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 2.2.9 on 2026-10-18 18:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+
+def copy_form(apps, schema_editor):
+    # batches commit one by one, so only a few rows are locked at a time
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM forms_formresponse")
+        last_id = cursor.fetchone()[0]
+        for start in range(0, last_id + 1, BATCH_SIZE):
+            cursor.execute("""
+                UPDATE forms_formresponse response SET form_id = instance.form_id
+                FROM forms_forminstance instance
+                WHERE instance.id = response.form_instance_id
+                AND response.id >= %s AND response.id < %s AND response.form_id IS NULL
+            """, [start, start + BATCH_SIZE])
+        # responses created by the old code while this was running
+        cursor.execute("""
+            UPDATE forms_formresponse response SET form_id = instance.form_id
+            FROM forms_forminstance instance
+            WHERE instance.id = response.form_instance_id AND response.form_id IS NULL
+        """)
+
+
+class Migration(migrations.Migration):
+    # for CREATE INDEX CONCURRENTLY and so each batch of the copy commits on its own
+    atomic = False
+
+    dependencies = [
+        ('forms', '0040_submissioncount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formresponse',
+            name='form',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='forms.Form'),
+        ),
+        migrations.RunPython(copy_form, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='formresponse',
+            name='form',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, to='forms.Form'),
+        ),
+        # the inbox of a form, ordered like FormResponse.get_all_for_form,
+        # this also serves the foreign key
+        migrations.RunSQL(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS forms_formresponse_form_inbox_idx
+            ON forms_formresponse (form_id, status, COALESCE(last_status_changed_date, submission_date) DESC, id DESC)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS forms_formresponse_form_inbox_idx",
+        ),
+        migrations.RunSQL(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS forms_formresponse_instance_inbox_idx
+            ON forms_formresponse (form_instance_id, status, COALESCE(last_status_changed_date, submission_date) DESC)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS forms_formresponse_instance_inbox_idx",
+        ),
+        # the changes feed of a form, see FormResponseChanges
+        migrations.RunSQL(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS forms_formresponse_form_changes_idx
+            ON forms_formresponse (form_id, change_transaction, change_sequence)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS forms_formresponse_form_changes_idx",
+        ),
+    ]
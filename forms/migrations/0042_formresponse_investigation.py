@@ -0,0 +1,56 @@
+# Generated by Django 2.2.9 on 2026-10-18 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+
+def copy_investigation(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM forms_formresponse")
+        last_id = cursor.fetchone()[0]
+        for start in range(0, last_id + 1, BATCH_SIZE):
+            cursor.execute("""
+                UPDATE forms_formresponse response SET investigation_id = form.investigation_id
+                FROM forms_form form
+                WHERE form.id = response.form_id
+                AND response.id >= %s AND response.id < %s AND response.investigation_id IS NULL
+            """, [start, start + BATCH_SIZE])
+        # responses created by the old code while this was running
+        cursor.execute("""
+            UPDATE forms_formresponse response SET investigation_id = form.investigation_id
+            FROM forms_forminstance instance, forms_form form
+            WHERE instance.id = response.form_instance_id AND form.id = instance.form_id
+            AND response.investigation_id IS NULL
+        """)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('forms', '0041_formresponse_form'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formresponse',
+            name='investigation',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='forms.Investigation'),
+        ),
+        migrations.RunPython(copy_investigation, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='formresponse',
+            name='investigation',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, to='forms.Investigation'),
+        ),
+        # the changes feed of an investigation, this also serves the foreign key
+        migrations.RunSQL(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS forms_formresponse_investigation_changes_idx
+            ON forms_formresponse (investigation_id, change_transaction, change_sequence)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS forms_formresponse_investigation_changes_idx",
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.9 on 2026-10-18 19:40
+
+from django.db import migrations
+
+EMAIL_INDEX = "forms_formresponse_email_trgm_idx"
+
+
+def create_email_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        # pg_trgm is a contrib module that not every Postgres install
+        # ships, searching by email works without the index, just slower
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # matches the SQL of the `json__email__icontains` filter in the response list
+        cursor.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {}
+            ON forms_formresponse USING gin (UPPER((json ->> 'email')::text) gin_trgm_ops)
+        """.format(EMAIL_INDEX))
+
+
+def drop_email_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS {}".format(EMAIL_INDEX))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('forms', '0042_formresponse_investigation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+        # the default operator class, unlike jsonb_path_ops it supports
+        # the `?` operator that `json__has_key` filters with
+        migrations.RunSQL(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS forms_formresponse_json_idx
+            ON forms_formresponse USING gin (json)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS forms_formresponse_json_idx",
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.9 on 2026-10-18 20:15
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('forms', '0043_formresponse_json_indexes'),
+    ]
+
+    operations = [
+        # filled by `manage.py rebuild_search_vectors` for existing responses
+        migrations.AddField(
+            model_name='formresponse',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS forms_formresponse_search_idx
+            ON forms_formresponse USING gin (search_vector)
+            """,
+            "DROP INDEX CONCURRENTLY IF EXISTS forms_formresponse_search_idx",
+        ),
+    ]
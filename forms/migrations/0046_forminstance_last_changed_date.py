@@ -0,0 +1,20 @@
+# Generated by Django 2.2.9 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0045_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forminstance',
+            name='last_changed_date',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -1,15 +1,21 @@
+import hashlib
 import math
-from collections import namedtuple
+import uuid
+from collections import Counter, namedtuple
 from datetime import timedelta
+from functools import partial
 
 import django.core.validators as validators
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager, Group
 from django.contrib.postgres.fields import JSONField
-from django.core.mail import send_mail
-from django.db import models
-from django.db.models import Count
-from django.db.models.functions import Coalesce, TruncDate
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                           SearchVector, SearchVectorField)
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Cast, Coalesce, TruncDate
 from django.dispatch import receiver
 from django.template import Context, Engine
 from django.template.loader import get_template
@@ -18,7 +24,10 @@ from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
 from guardian.shortcuts import assign_perm, get_users_with_perms
+from jsonschema import FormatChecker
+from jsonschema.validators import validator_for
 
+from .caches import FormInstanceCache, ObjectCache, PayloadCache
 from .mixins import UniqueSlugMixin, validate_slug_stricter
 
 Roles = namedtuple('Roles', ['ADMIN', 'OWNER', 'EDITOR', 'VIEWER'])
@@ -67,27 +76,46 @@ class Investigation(models.Model, UniqueSlugMixin):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def _submission_stats_counts(prefix=""):
+        """ conditional sums over the `SubmissionCount`s `prefix` leads to """
+        yesterday = timezone.localdate() - timedelta(days=1)
+        count = "{}count".format(prefix)
+        return {
+            "stats_total": Coalesce(Sum(count), 0),
+            "stats_yesterday": Coalesce(Sum(count, filter=Q(**{"{}date".format(prefix): yesterday})), 0),
+            "stats_to_verify": Coalesce(Sum(count, filter=Q(**{"{}status".format(prefix): "S"})), 0),
+        }
+
+    @classmethod
+    def with_submission_stats(cls, queryset):
+        """ annotates a queryset of investigations with everything
+        `submission_stats` needs so it does not have to query per investigation"""
+        return queryset.annotate(**cls._submission_stats_counts("form__submission_counts__"))
+
     def submission_stats(self):
-        investigations = FormResponse.objects.filter(
-            form_instance__form__investigation=self)
-        total = investigations.count()
-        today_start = timezone.now().replace(minute=0, hour=0, second=0)
-        yesterday_start = today_start - timedelta(days=1)
-        yesterday = investigations.filter(submission_date__gte=yesterday_start)\
-                                  .filter(submission_date__lt=today_start)\
-                                  .count()
-        to_verify = investigations.filter(status="S").count()
+        if hasattr(self, "stats_total"):
+            stats = {"stats_total": self.stats_total,
+                     "stats_yesterday": self.stats_yesterday,
+                     "stats_to_verify": self.stats_to_verify}
+        else:
+            stats = SubmissionCount.objects \
+                .filter(form__investigation=self) \
+                .aggregate(**self._submission_stats_counts())
         return {
-            "total": total,
-            "yesterday": yesterday,
-            "to_verify": to_verify,
+            "total": stats["stats_total"],
+            "yesterday": stats["stats_yesterday"],
+            "to_verify": stats["stats_to_verify"],
         }
 
-    @property
-    def manager_users(self):
+    def _manager_user_ids(self):
         user_perms = get_users_with_perms(
             self, with_superusers=True, attach_perms=True)
-        return [user for (user, perms) in user_perms.items() if "manage_investigation" in perms]
+        return [user.id for (user, perms) in user_perms.items() if "manage_investigation" in perms]
+
+    @property
+    def manager_users(self):
+        return list(User.objects.filter(id__in=manager_user_ids.get(self)).order_by("id"))
 
     @property
     def admin_users(self):
@@ -165,6 +193,12 @@ def my_post_delete_callback(sender, **kwargs):
     kwargs['instance'].group.delete()
 
 
+@receiver(models.signals.post_save, sender=UserGroup)
+@receiver(models.signals.post_delete, sender=UserGroup)
+def invalidate_user_group_caches(sender, instance, *args, **kwargs):
+    manager_user_ids.invalidate(instance.investigation_id)
+
+
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
 
@@ -212,6 +246,22 @@ class User(AbstractUser):
         return self.first_name or self.email
 
 
+@receiver(models.signals.m2m_changed, sender=User.groups.through)
+def invalidate_group_member_caches(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        group_ids = [instance.pk]
+    elif action == "pre_clear":
+        group_ids = list(instance.groups.values_list("id", flat=True))
+    else:
+        group_ids = pk_set
+    investigation_ids = UserGroup.objects \
+        .filter(group_id__in=group_ids) \
+        .values_list("investigation_id", flat=True)
+    manager_user_ids.invalidate(*investigation_ids)
+
+
 class Partner(models.Model):
     name = models.CharField(max_length=200)
     logo = models.FileField()
@@ -250,28 +300,124 @@ class Form(models.Model, UniqueSlugMixin):
     def get_all_for_investigation(cls, investigation_slug):
         return cls.objects.filter(investigation__slug=investigation_slug).all()
 
-    @property
-    def instance_properties(self):
+    def _instance_properties(self):
         props = {}
         for instance in FormInstance.objects.filter(form=self).all():
             props.update(instance.json_properties)
         return props
 
+    @property
+    def instance_properties(self):
+        return form_instance_properties.get(self)
+
     def submissions_by_date(self):
-        return FormResponse.objects \
-            .filter(form_instance__form=self) \
-            .annotate(date=TruncDate('submission_date')) \
+        return SubmissionCount.objects \
+            .filter(form=self) \
             .values('date') \
-            .annotate(c=Count('id')) \
+            .annotate(c=Sum('count')) \
+            .filter(c__gt=0) \
             .values('date', 'c') \
             .order_by('date')
 
     def count_by_bucket(self):
-        results = FormResponse.objects \
-            .filter(form_instance__form=self) \
+        return bucket_counts.get(self)
+
+    def facet_counts(self):
+        """ `FormResponseQuerySet.facets` of all responses of the form """
+        return facet_counts.get(self)
+
+    def _facet_counts(self):
+        return FormResponse.objects.filter(form=self).facets()
+
+    def _count_by_bucket(self):
+        results = SubmissionCount.objects \
+            .filter(form=self) \
             .values("status") \
-            .annotate(count=Count('status'))
-        return {bucket["status"]: bucket["count"] for bucket in results}
+            .annotate(total=Sum('count')) \
+            .filter(total__gt=0)
+        return {bucket["status"]: bucket["total"] for bucket in results}
+
+
+def field_title(name, props, flat_ui_schema):
+    title = props.get("question") or flat_ui_schema.get(name, {}).get("ui:question", name)
+    if not title or name == title:
+        title = props.get("title") or flat_ui_schema.get(name, {}).get("ui:title", name)
+    if not title:
+        title = name
+    return title
+
+
+FieldKinds = namedtuple('FieldKinds', ['FILE', 'FILE_ARRAY', 'BOOLEAN', 'TEXT'])
+FIELD_KINDS = FieldKinds(FILE="file", FILE_ARRAY="file_array", BOOLEAN="boolean", TEXT="text")
+
+RenderedField = namedtuple('RenderedField', ['name', 'title', 'label', 'data_type', 'kind'])
+
+
+def compile_render_plan(form_instance):
+    """
+    Works out everything `FormResponse.rendered_fields` needs to know
+    about the fields of an instance: their order, titles and how their
+    values are rendered.
+    """
+    flat_ui_schema = form_instance.flat_ui_schema
+
+    priorities = {}
+    for index, name in enumerate(form_instance.priority_fields):
+        priorities.setdefault(name, index)
+
+    properties = form_instance.flat_schema["properties"]
+    sorted_properties = sorted(properties.items(),
+                               key=lambda item: priorities.get(item[0], math.inf))
+
+    plan = []
+    for name, props in sorted_properties:
+        if (flat_ui_schema.get(name, dict()).get("ui:widget") ==
+                "signatureWidget" or props.get("format") == "data-url"):
+            kind = FIELD_KINDS.FILE
+        elif props.get("type") == "array" and props["items"].get("format") == "data-url":
+            kind = FIELD_KINDS.FILE_ARRAY
+        elif props.get("type") == "boolean":
+            kind = FIELD_KINDS.BOOLEAN
+        else:
+            kind = FIELD_KINDS.TEXT
+        plan.append(RenderedField(name=name,
+                                  title=field_title(name, props, flat_ui_schema),
+                                  label=props.get("title"),
+                                  data_type=props.get("type"),
+                                  kind=kind))
+    return tuple(plan)
+
+
+render_plans = FormInstanceCache(compile_render_plan)
+
+# renders the templates that are part of form instances
+template_engine = Engine()
+
+
+def compile_template(field, form_instance):
+    return template_engine.from_string(str(getattr(form_instance, field)))
+
+
+# one cache per field, so a broken template does not affect the others
+compiled_templates = {field: FormInstanceCache(partial(compile_template, field))
+                      for field in ("email_template", "email_template_html", "redirect_url_template")}
+
+
+def compile_schema_validator(form_instance):
+    """ a validator for the answers to all steps of an instance """
+    schema = form_instance.flat_schema
+    return validator_for(schema)(schema, format_checker=FormatChecker())
+
+
+schema_validators = FormInstanceCache(compile_schema_validator)
+
+# shown on every page of the inbox
+bucket_counts = ObjectCache("count_by_bucket", Form._count_by_bucket)
+facet_counts = ObjectCache("facet_counts", Form._facet_counts)
+form_instance_properties = ObjectCache("instance_properties", Form._instance_properties)
+manager_user_ids = ObjectCache("manager_user_ids", Investigation._manager_user_ids)
+# what respondents load, by form slug, see `FormInstanceDetail`
+latest_form_instances = PayloadCache("latest_form_instance")
 
 
 class FormInstance(models.Model):
@@ -286,6 +432,8 @@ class FormInstance(models.Model):
         default=_("Thank you for participating in a crowdnewsroom investigation!"))
     redirect_url_template = models.TextField(
         default="https://forms.crowdnewsroom.org")
+    # changes on every save, keys `FormInstanceCache`
+    last_changed_date = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return "{} - Instance version {}".format(self.form.name, self.version)
@@ -309,6 +457,34 @@ class FormInstance(models.Model):
     def json_properties(self):
         return {k: v.get('title', k.title()) for k, v in self.flat_schema["properties"].items()}
 
+    @property
+    def flat_ui_schema(self):
+        flat_ui_schema = {}
+        for (key, values) in self.ui_schema_json.items():
+            if values:
+                flat_ui_schema.update(values)
+        return flat_ui_schema
+
+    @property
+    def render_plan(self):
+        return render_plans.get(self)
+
+    @property
+    def schema_validator(self):
+        """ checks responses against `flat_schema`, it is only built once
+        per version of the instance """
+        return schema_validators.get(self)
+
+    def compiled_template(self, field):
+        """ the template in `field` ready to render, it is only parsed
+        once per version of the instance """
+        return compiled_templates[field].get(self)
+
+    @property
+    def csv_columns(self):
+        """ maps every field of this instance to the column it gets in CSV exports"""
+        return {field.name: field.label or field.title for field in self.render_plan}
+
     @property
     def is_simple(self):
         return self.form.is_simple
@@ -322,6 +498,144 @@ class FormInstance(models.Model):
         return dict(settings.LANGUAGES)
 
 
+@receiver(models.signals.post_save, sender=FormInstance)
+@receiver(models.signals.post_delete, sender=FormInstance)
+def invalidate_form_instance_caches(sender, instance, *args, **kwargs):
+    FormInstanceCache.invalidate_all(instance.pk)
+    form_instance_properties.invalidate(instance.form_id)
+    latest_form_instances.invalidate(*Form.objects.filter(id=instance.form_id).values_list("slug", flat=True))
+
+
+@receiver(models.signals.post_save, sender=Form)
+def invalidate_form_caches(sender, instance, *args, **kwargs):
+    # the public payload contains the form's language
+    latest_form_instances.invalidate(instance.slug)
+
+
+# orders all changes to responses, see `FormResponse.change_sequence`
+CHANGE_SEQUENCE = "forms_formresponse_change_seq"
+
+
+def next_change():
+    """ the id of the current transaction and the next sequence number,
+    needs to run in the transaction that makes the change """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT txid_current(), nextval(%s)", [CHANGE_SEQUENCE])
+        return cursor.fetchone()
+
+
+class NextChangeSequence(models.Func):
+    """ the next sequence number for use in queries, every row gets its own value """
+    function = "nextval"
+    output_field = models.BigIntegerField()
+
+    def __init__(self):
+        super().__init__(models.Value(CHANGE_SEQUENCE))
+
+
+class CurrentTransaction(models.Func):
+    template = "txid_current()"
+    output_field = models.BigIntegerField()
+
+
+class ChangeHorizon(models.Func):
+    """
+    The oldest transaction that may still be running. It may yet commit
+    changes with lower sequence numbers than ones that are already visible,
+    so the changes feed holds back everything from it and later transactions.
+    """
+    template = "txid_snapshot_xmin(txid_current_snapshot())"
+    output_field = models.BigIntegerField()
+
+
+# full-text search configurations for the languages forms can have
+SEARCH_CONFIGS = {
+    "de": "german",
+    "en": "english",
+}
+
+
+def search_config(language):
+    return SEARCH_CONFIGS.get(language, "simple")
+
+
+class FormResponseQuerySet(models.QuerySet):
+    def search(self, text, language):
+        """ responses whose text answers match the search terms, ranked
+        by relevance in `search_rank` with the best matches first """
+        query = SearchQuery(text, config=search_config(language))
+        # ts_rank is a real, as numeric it reaches clients and comes back
+        # in cursors without rounding, which floats do on older Postgres
+        rank = Cast(SearchRank(models.F("search_vector"), query),
+                    models.DecimalField(max_digits=20, decimal_places=10))
+        return self \
+            .filter(search_vector=query) \
+            .annotate(search_rank=rank) \
+            .order_by("-search_rank", "-id")
+
+    def facets(self):
+        """ counts the responses per status, and per tag and assignee
+        within each status, in a single query. Returns a dict like
+        `{"status": {"S": 3}, "tags": {"S": {tag_id: 2}}, "assignees": {"S": {user_id: 1}}}` """
+        responses = self.order_by().values("id", "status").distinct()
+        sql, params = responses.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                WITH responses AS ({responses})
+                SELECT GROUPING(tags.tag_id, assignees.user_id), responses.status,
+                       tags.tag_id, assignees.user_id, COUNT(DISTINCT responses.id)
+                FROM responses
+                LEFT JOIN {tags} tags ON tags.formresponse_id = responses.id
+                LEFT JOIN {assignees} assignees ON assignees.formresponse_id = responses.id
+                GROUP BY GROUPING SETS ((responses.status),
+                                        (responses.status, tags.tag_id),
+                                        (responses.status, assignees.user_id))
+            """.format(responses=sql,
+                       tags=FormResponse.tags.through._meta.db_table,
+                       assignees=FormResponse.assignees.through._meta.db_table), params)
+            rows = cursor.fetchall()
+
+        facets = {"status": {}, "tags": {}, "assignees": {}}
+        for grouping, status, tag_id, user_id, total in rows:
+            # GROUPING has a bit set for each column that is not grouped by
+            if grouping == 3:
+                facets["status"][status] = total
+            elif grouping == 1 and tag_id is not None:
+                facets["tags"].setdefault(status, {})[tag_id] = total
+            elif grouping == 2 and user_id is not None:
+                facets["assignees"].setdefault(status, {})[user_id] = total
+        return facets
+
+    def touch(self, **fields):
+        """ updates the responses and marks them as changed for
+        exports and the changes feed"""
+        return self.update(last_changed_date=timezone.now(),
+                           change_transaction=CurrentTransaction(),
+                           change_sequence=NextChangeSequence(),
+                           **fields)
+
+    def set_status(self, status):
+        """ moves the responses to another bucket, keeping `SubmissionCount` in sync """
+        with transaction.atomic():
+            ids = list(self.select_for_update().values_list("id", flat=True))
+            form_responses = FormResponse.objects.filter(id__in=ids)
+
+            moved = form_responses \
+                .exclude(status=status) \
+                .annotate(date=TruncDate("submission_date")) \
+                .values("form_id", "date", "status") \
+                .annotate(total=Count("id")) \
+                .order_by()
+            changes = Counter()
+            for group in moved:
+                form_id, date = group["form_id"], group["date"]
+                changes[(form_id, date, group["status"])] -= group["total"]
+                changes[(form_id, date, status)] += group["total"]
+
+            form_responses.touch(status=status, last_status_changed_date=timezone.now())
+            SubmissionCount.add(changes)
+
+
 class FormResponse(models.Model):
     STATUSES = (
         ('S', _('Submitted')),
@@ -330,18 +644,87 @@ class FormResponse(models.Model):
     )
     json = JSONField()
     form_instance = models.ForeignKey(FormInstance, on_delete=models.CASCADE)
+    # copied from `form_instance` on save so lookups by form or investigation
+    # need no joins, indexed together with the orderings in the migrations
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, editable=False, db_index=False)
+    investigation = models.ForeignKey(Investigation, on_delete=models.CASCADE, editable=False, db_index=False)
     status = models.CharField(max_length=1, choices=STATUSES, default='S')
     submission_date = models.DateTimeField()
     last_status_changed_date = models.DateTimeField(default=None, blank=True,
                                                     null=True)
+    # updated whenever anything that shows up in exports changes
+    last_changed_date = models.DateTimeField(auto_now=True)
+    # advanced on every change, lets clients ask for what changed since
+    # they last looked. Set by `save`, use `FormResponseQuerySet.touch` for bulk updates.
+    change_sequence = models.BigIntegerField(default=0, db_index=True, editable=False)
+    # the transaction that made the change, the feed is ordered by it first,
+    # see `ChangeHorizon`. 0 for changes from before it was recorded.
+    change_transaction = models.BigIntegerField(default=0, editable=False)
+    # the text answers for full-text search, see `FormResponseQuerySet.search`
+    search_vector = SearchVectorField(null=True, editable=False)
     tags = models.ManyToManyField(Tag, blank=True)
     assignees = models.ManyToManyField(User)
 
+    objects = FormResponseQuerySet.as_manager()
+
     class Meta:
         permissions = (
             ('edit_response', _('Edit response')),
         )
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        form_instance = self.form_instance
+        if self.form_id != form_instance.form_id or self.investigation_id is None:
+            self.form_id = form_instance.form_id
+            self.investigation_id = form_instance.form.investigation_id
+        with transaction.atomic():
+            previous = None
+            self.change_transaction, self.change_sequence = next_change()
+            if not adding:
+                if update_fields is not None:
+                    extra_fields = {"change_transaction", "change_sequence", "last_changed_date"}
+                    if "form_instance" in update_fields:
+                        extra_fields |= {"form", "investigation"}
+                    if {"json", "form_instance"} & set(update_fields):
+                        extra_fields.add("search_vector")
+                    kwargs["update_fields"] = set(update_fields) | extra_fields
+                if update_fields is None or {"status", "submission_date"} & set(update_fields):
+                    previous = FormResponse.objects \
+                        .select_for_update() \
+                        .filter(pk=self.pk) \
+                        .values_list("status", "submission_date") \
+                        .first()
+
+            if update_fields is None or {"json", "form_instance"} & set(update_fields):
+                self.search_vector = self.get_search_vector()
+            super().save(*args, **kwargs)
+
+            changes = Counter()
+            form_id = self.form_id
+            if adding:
+                changes[(form_id, _submission_day(self.submission_date), self.status)] += 1
+            elif previous:
+                previous_status, previous_date = previous
+                changes[(form_id, _submission_day(previous_date), previous_status)] -= 1
+                changes[(form_id, _submission_day(self.submission_date), self.status)] += 1
+            SubmissionCount.add(changes)
+
+    def search_text(self):
+        """ the answers to the text fields of the form """
+        answers = []
+        for field in self.form_instance.render_plan:
+            value = self.json.get(field.name)
+            if field.kind == FIELD_KINDS.TEXT and field.data_type == "string" and isinstance(value, str):
+                answers.append(value)
+        return "\n".join(answers)
+
+    def get_search_vector(self):
+        language = self.form_instance.form.language
+        text = models.Value(self.search_text(), output_field=models.TextField())
+        return SearchVector(text, config=search_config(language))
+
     def all_json_properties(self):
         properties = {}
         for step in self.form_instance.form_json:
@@ -356,60 +739,45 @@ class FormResponse(models.Model):
     def valid_keys(self):
         return self.all_json_properties().keys()
 
-    def _priority_order(self, elem):
-        try:
-            return self.form_instance.priority_fields.index(elem[0])
-        except ValueError:
-            return math.inf
-
-    def rendered_fields(self):
+    def rendered_fields(self, only=None):
+        """ the response's answers ready for display, `only` can limit
+        them to a collection of JSON keys """
         form_data = self.json
+        form = self.form_instance.form
 
-        flat_ui_schema = {}
-
-        for (key, values) in self.form_instance.ui_schema_json.items():
-            if values:
-                flat_ui_schema.update(values)
-
-        sorted_properties = sorted(self.all_json_properties().items(),
-                                   key=self._priority_order)
-
-        for name, props in sorted_properties:
-            title = props.get("question") or flat_ui_schema.get(name, {}).get("ui:question", name)
-            if not title or name == title:
-                title = props.get("title") or flat_ui_schema.get(name, {}).get("ui:title", name)
-            if not title:
-                title = name
-            row = {"title": title, "label":props.get("title"), "json_name": name,
-                   "data_type": props.get("type")}
-            if (flat_ui_schema.get(name, dict()).get("ui:widget") ==
-                    "signatureWidget" or props.get("format") == "data-url"):
+        for field in self.form_instance.render_plan:
+            name = field.name
+            if only is not None and name not in only:
+                continue
+            row = {"title": field.title, "label": field.label, "json_name": name,
+                   "data_type": field.data_type}
+            if field.kind == FIELD_KINDS.FILE:
                 if form_data.get(name):
                     row["type"] = "link"
                     row["value"] = reverse("response_file",
-                                           kwargs={"investigation_slug": self.form_instance.form.investigation.slug,
-                                                   "form_slug": self.form_instance.form.slug,
+                                           kwargs={"investigation_slug": form.investigation.slug,
+                                                   "form_slug": form.slug,
                                                    "response_id": self.id,
                                                    "file_field": name
                                                    })
                 else:
                     row["type"] = "text"
                     row["value"] = ""
-            elif props.get("type") == "array" and props["items"].get("format") == "data-url":
+            elif field.kind == FIELD_KINDS.FILE_ARRAY:
                 for index, part in enumerate(form_data.get(name, [])):
-                    row = {"title": "{} {}".format(title, index),
+                    row = {"title": "{} {}".format(field.title, index),
                            "json_name": "{}-{}".format(name, index)}
                     row["type"] = "link"
                     row["value"] = reverse("response_file_array",
-                                           kwargs={"investigation_slug": self.form_instance.form.investigation.slug,
-                                                   "form_slug": self.form_instance.form.slug,
+                                           kwargs={"investigation_slug": form.investigation.slug,
+                                                   "form_slug": form.slug,
                                                    "response_id": self.id,
                                                    "file_field": name,
                                                    "file_index": index
                                                    })
                     yield row
                 continue
-            elif props.get("type") == "boolean":
+            elif field.kind == FIELD_KINDS.BOOLEAN:
                 row["type"] = "text"
                 row["value"] = _("Yes") if form_data.get(name) else _("No")
             else:
@@ -417,10 +785,27 @@ class FormResponse(models.Model):
                 row["value"] = form_data.get(name, "")
             yield row
 
+    def image_attachments_by_json_name(self):
+        """ maps the `json_name` of rendered file fields to their
+        attachment, as long as that is an image"""
+        attachments = {attachment.reference: attachment
+                       for attachment in self.attachments.all()
+                       if attachment.is_image}
+        result = {}
+        for field in self.form_instance.render_plan:
+            value = self.json.get(field.name)
+            if field.kind == FIELD_KINDS.FILE and isinstance(value, str):
+                if value in attachments:
+                    result[field.name] = attachments[value]
+            elif field.kind == FIELD_KINDS.FILE_ARRAY and isinstance(value, list):
+                for index, part in enumerate(value):
+                    if isinstance(part, str) and part in attachments:
+                        result["{}-{}".format(field.name, index)] = attachments[part]
+        return result
+
     @property
     def redirect_url(self):
-        url_template = self.form_instance.redirect_url_template
-        template = Engine().from_string(url_template)
+        template = self.form_instance.compiled_template("redirect_url_template")
         context = Context(dict(response=self.json))
         return template.render(context=context)
 
@@ -443,18 +828,17 @@ class FormResponse(models.Model):
         return ""
 
     def belongs_to_investigation(self, investigation_slug):
-        return self.form_instance.form.investigation.slug == investigation_slug
+        return self.investigation.slug == investigation_slug
 
     @property
     def taglist(self):
-        investigation = self.form_instance.form.investigation
-        return Tag.objects.filter(investigation=investigation)
+        return Tag.objects.filter(investigation_id=self.investigation_id)
 
     @classmethod
     def get_all_for_form(cls, form):
         return cls.objects\
-            .filter(form_instance__form=form) \
-            .order_by(Coalesce('last_status_changed_date', 'submission_date').desc())
+            .filter(form=form) \
+            .order_by(Coalesce('last_status_changed_date', 'submission_date').desc(), '-id')
 
     def __str__(self):
         try:
@@ -465,10 +849,8 @@ class FormResponse(models.Model):
 
 
 def generate_emails(form_response: FormResponse):
-    plaintext_template = Engine().from_string(
-        str(form_response.form_instance.email_template))
-    html_template = Engine().from_string(
-        str(form_response.form_instance.email_template_html))
+    plaintext_template = form_response.form_instance.compiled_template("email_template")
+    html_template = form_response.form_instance.compiled_template("email_template_html")
     context = Context(dict(response=form_response.json,
                            field_list=mark_safe(form_response.email_fields)))
     return (plaintext_template.render(context=context),
@@ -483,11 +865,237 @@ def send_email(sender, instance, created, *args, **kwargs):
         confirm_summary = form_response.json.get("confirm_summary")
         if email and confirm_summary:
             message, html_message = generate_emails(form_response)
-            send_mail(subject=_("Thank you for your submission!"),
-                      message=message,
-                      from_email=settings.DEFAULT_FROM_EMAIL,
-                      recipient_list=[email],
-                      html_message=html_message)
+            OutgoingEmail.objects.create(subject=_("Thank you for your submission!"),
+                                         message=message,
+                                         html_message=html_message,
+                                         recipient=email,
+                                         form_response=form_response)
+
+
+@receiver(models.signals.m2m_changed, sender=FormResponse.tags.through)
+@receiver(models.signals.m2m_changed, sender=FormResponse.assignees.through)
+def touch_form_responses(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        form_responses = FormResponse.objects.filter(id__in=pk_set or [])
+        form_ids = form_responses.values_list("form_id", flat=True).distinct()
+    else:
+        form_responses = FormResponse.objects.filter(id=instance.id)
+        form_ids = [instance.form_id]
+    form_responses.touch()
+    facet_counts.invalidate(*form_ids)
+
+
+def _submission_day(submission_date):
+    """ the day a submission counts towards, matches `TruncDate` """
+    if timezone.is_naive(submission_date):
+        submission_date = timezone.make_aware(submission_date)
+    return timezone.localtime(submission_date).date()
+
+
+class SubmissionCount(models.Model):
+    """ number of responses per form, day of submission and status
+
+    This is kept up to date as responses are created, deleted or change
+    their status so dashboards do not have to aggregate all responses.
+    Run the `rebuild_submission_counts` command after changing responses
+    in any other way (e.g. with `bulk_create`)."""
+    form = models.ForeignKey(Form, on_delete=models.CASCADE, related_name="submission_counts")
+    date = models.DateField()
+    status = models.CharField(max_length=1, choices=FormResponse.STATUSES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("form", "date", "status")
+
+    def __str__(self):
+        return "{} {} {}: {}".format(self.form, self.date, self.status, self.count)
+
+    @classmethod
+    def add(cls, changes):
+        """ applies a mapping of (form_id, date, status) to the number
+        of responses that were added (or removed if negative) """
+        table = cls._meta.db_table
+        form_ids = {form_id for (form_id, date, status) in changes}
+        bucket_counts.invalidate(*form_ids)
+        facet_counts.invalidate(*form_ids)
+        increments = [(key, amount) for key, amount in changes.items() if amount > 0]
+        decrements = [(key, -amount) for key, amount in changes.items() if amount < 0]
+        with connection.cursor() as cursor:
+            if increments:
+                cursor.execute(
+                    "INSERT INTO {table} (form_id, date, status, count) VALUES {values} "
+                    "ON CONFLICT (form_id, date, status) "
+                    "DO UPDATE SET count = {table}.count + EXCLUDED.count".format(
+                        table=table, values=", ".join(["(%s, %s, %s, %s)"] * len(increments))),
+                    [value for key, amount in increments for value in key + (amount,)])
+            # the counts might already be gone if the whole form is being deleted
+            for (form_id, date, status), amount in decrements:
+                cursor.execute(
+                    "UPDATE {table} SET count = count - %s "
+                    "WHERE form_id = %s AND date = %s AND status = %s".format(table=table),
+                    [amount, form_id, date, status])
+
+    @classmethod
+    def rebuild(cls):
+        """ recounts everything from the responses """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # block writes to the counts until we are done so
+                # no response gets counted twice or not at all
+                cursor.execute("LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE".format(cls._meta.db_table))
+            cls.objects.all().delete()
+            groups = FormResponse.objects \
+                .annotate(date=TruncDate("submission_date")) \
+                .values("form_id", "date", "status") \
+                .annotate(total=Count("id")) \
+                .order_by()
+            cls.objects.bulk_create(cls(form_id=group["form_id"],
+                                        date=group["date"],
+                                        status=group["status"],
+                                        count=group["total"])
+                                    for group in groups)
+        form_ids = Form.objects.values_list("id", flat=True)
+        bucket_counts.invalidate(*form_ids)
+        facet_counts.invalidate(*form_ids)
+
+
+@receiver(models.signals.post_delete, sender=FormResponse)
+def uncount_form_response(sender, instance, *args, **kwargs):
+    SubmissionCount.add(Counter({(instance.form_id, _submission_day(instance.submission_date), instance.status): -1}))
+
+
+@receiver(models.signals.post_save, sender=Form)
+def move_form_responses(sender, instance, created, *args, **kwargs):
+    # keeps `FormResponse.investigation` right when a form changes investigations
+    if not created:
+        FormResponse.objects \
+            .filter(form=instance) \
+            .exclude(investigation_id=instance.investigation_id) \
+            .touch(investigation_id=instance.investigation_id)
+
+
+class AttachmentBlob(models.Model):
+    """ the content of uploaded files, stored once per SHA-256 digest
+    no matter how many attachments point to it"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to="attachments/")
+    size = models.BigIntegerField(default=0)
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+    @classmethod
+    def get_or_create_for_content(cls, content):
+        """ call within the transaction that saves the attachment, the
+        blob stays locked until then so gc_attachments cannot delete it """
+        digest = hashlib.sha256(content).hexdigest()
+        blob = cls.objects.select_for_update().filter(sha256=digest).first()
+        if blob:
+            return blob
+
+        blob = cls(sha256=digest, size=len(content))
+        blob.file.save(digest, ContentFile(content), save=False)
+        try:
+            with transaction.atomic():
+                blob.save()
+        except IntegrityError:
+            # someone else stored the same content in the meantime
+            blob.file.delete(save=False)
+            blob = cls.objects.select_for_update().get(sha256=digest)
+        return blob
+
+    @classmethod
+    def orphans(cls, min_age=timedelta(hours=1)):
+        """ blobs that no attachment points to anymore, recent ones are
+        left alone as they might be about to get referenced"""
+        return cls.objects \
+            .annotate(reference_count=Count("attachments")) \
+            .filter(reference_count=0, created_date__lt=timezone.now() - min_age)
+
+
+@receiver(models.signals.post_delete, sender=AttachmentBlob)
+def delete_attachment_blob_file(sender, instance, *args, **kwargs):
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+class Attachment(models.Model):
+    """ a file that was uploaded with a response, the response's
+    JSON only holds a reference to it (see `Attachment.reference`)"""
+    REFERENCE_PREFIX = "attachment:"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    form_response = models.ForeignKey(FormResponse, on_delete=models.CASCADE,
+                                      related_name="attachments", blank=True, null=True)
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.PROTECT, related_name="attachments")
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.filename
+
+    @property
+    def file(self):
+        return self.blob.file
+
+    @property
+    def is_image(self):
+        return self.content_type.startswith("image/")
+
+    @property
+    def size(self):
+        return self.blob.size
+
+    @property
+    def reference(self):
+        return "{}{}".format(self.REFERENCE_PREFIX, self.id)
+
+    @classmethod
+    def is_reference(cls, value):
+        return isinstance(value, str) and value.startswith(cls.REFERENCE_PREFIX)
+
+    @classmethod
+    def get_for_reference(cls, form_response, reference):
+        """ returns the attachment a reference in the response's JSON points to """
+        try:
+            attachment_id = uuid.UUID(reference[len(cls.REFERENCE_PREFIX):])
+        except ValueError:
+            return None
+        return cls.objects \
+            .filter(id=attachment_id, form_response=form_response) \
+            .select_related("blob") \
+            .first()
+
+    def set_content(self, filename, content_type, content):
+        self.filename = filename
+        self.content_type = content_type
+        self.blob = AttachmentBlob.get_or_create_for_content(content)
+
+
+class AttachmentPreview(models.Model):
+    """ a scaled down version of an image blob, see `forms.attachments.get_preview` """
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.CASCADE, related_name="previews")
+    size = models.CharField(max_length=20)
+    file = models.FileField(upload_to="attachments/previews/")
+    file_size = models.BigIntegerField(default=0)
+    content_type = models.CharField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("blob", "size")
+
+    def __str__(self):
+        return "{} ({})".format(self.blob, self.size)
+
+
+@receiver(models.signals.post_delete, sender=AttachmentPreview)
+def delete_attachment_preview_file(sender, instance, *args, **kwargs):
+    if instance.file:
+        instance.file.delete(save=False)
 
 
 class Comment(models.Model):
@@ -499,6 +1107,14 @@ class Comment(models.Model):
     archived = models.BooleanField(default=False)
 
 
+@receiver(models.signals.post_save, sender=Comment)
+@receiver(models.signals.post_delete, sender=Comment)
+def touch_commented_form_response(sender, instance, *args, **kwargs):
+    FormResponse.objects \
+        .filter(id=instance.form_response_id) \
+        .touch()
+
+
 class Invitation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     investigation = models.ForeignKey(Investigation, on_delete=models.CASCADE)
@@ -542,3 +1158,214 @@ class FormInstanceTemplate(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ExportJob(models.Model):
+    STATUSES = (
+        ('P', _('Pending')),
+        ('R', _('Running')),
+        ('F', _('Finished')),
+        ('E', _('Failed'))
+    )
+    form = models.ForeignKey(Form, on_delete=models.CASCADE)
+    filter_params = JSONField(default=dict, blank=True)
+    base_url = models.TextField()
+    status = models.CharField(max_length=1, choices=STATUSES, default='P')
+    progress = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    file = models.FileField(upload_to="exports/", blank=True, null=True)
+    # describes the state of the form's responses the export was built from
+    fingerprint = models.CharField(max_length=100, blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL,
+                                     blank=True, null=True)
+    created_date = models.DateTimeField(auto_now_add=True)
+    # updated while the job runs, see `STALE_AFTER`
+    heartbeat_date = models.DateTimeField(blank=True, null=True)
+    finished_date = models.DateTimeField(blank=True, null=True)
+
+    # running jobs without a heartbeat for this long lost their worker
+    STALE_AFTER = timedelta(minutes=10)
+
+    def __str__(self):
+        return "Export {} of {}".format(self.pk, self.form)
+
+    @staticmethod
+    def get_fingerprint(form):
+        """ describes everything an export of the form is built from: its
+        responses, the columns of its instances, the tags and the slugs in the
+        links. Only the names of users (e.g. comment authors) are left out,
+        changing them does not make finished exports outdated """
+        responses = FormResponse.objects \
+            .filter(form=form) \
+            .aggregate(count=Count('id'), last_changed=Max('last_changed_date'))
+        form_instances = FormInstance.objects \
+            .filter(form=form) \
+            .aggregate(count=Count('id'), last_changed=Max('last_changed_date'))
+        tags = Tag.objects \
+            .filter(investigation_id=form.investigation_id) \
+            .order_by("id") \
+            .values_list("id", "name")
+        state = [form.slug, form.investigation.slug,
+                 responses["count"], responses["last_changed"],
+                 form_instances["count"], form_instances["last_changed"],
+                 list(tags)]
+        return hashlib.sha256(repr(state).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def get_or_create_for(cls, form, filter_params, base_url, user=None):
+        """ returns an export for the given filters and a flag that
+        tells whether it was newly created
+
+        Exports that are pending or running are shared, finished ones are
+        reused as long as nothing they are built from changed since, see
+        `get_fingerprint`. Running jobs whose worker died are shared as well,
+        `claim_next` hands them to another worker."""
+        fingerprint = cls.get_fingerprint(form)
+        jobs = cls.objects \
+            .filter(form=form, filter_params=filter_params, base_url=base_url) \
+            .order_by("-created_date")
+        reusable = jobs.filter(status__in=["P", "R"]).first() or \
+            jobs.filter(status="F", fingerprint=fingerprint).first()
+        if reusable:
+            return reusable, False
+        job = cls.objects.create(form=form,
+                                 filter_params=filter_params,
+                                 base_url=base_url,
+                                 requested_by=user)
+        return job, True
+
+    @classmethod
+    def claim_next(cls):
+        """ marks the oldest pending or stale job as running and returns it """
+        with transaction.atomic():
+            # the worker of a running job without a recent heartbeat died
+            stale = Q(status="R", heartbeat_date__lt=timezone.now() - cls.STALE_AFTER)
+            job = cls.objects \
+                .select_for_update(skip_locked=True) \
+                .filter(Q(status="P") | stale) \
+                .order_by("id") \
+                .first()
+            if job:
+                job.status = "R"
+                job.progress = 0
+                job.heartbeat_date = timezone.now()
+                job.fingerprint = cls.get_fingerprint(job.form)
+                job.save()
+        return job
+
+
+@receiver(models.signals.post_delete, sender=ExportJob)
+def delete_export_file(sender, instance, *args, **kwargs):
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+class OutgoingEmail(models.Model):
+    """
+    Emails waiting to be sent by `manage.py send_emails`, so requests
+    never wait on the mail server. Failed attempts are retried with an
+    exponential backoff until `MAX_ATTEMPTS` is reached.
+    """
+    STATUSES = (
+        ('P', _('Pending')),
+        ('S', _('Sent')),
+        ('E', _('Failed'))
+    )
+    MAX_ATTEMPTS = 8
+    RETRY_DELAY = timedelta(minutes=1)
+    # claimed emails that were not marked sent or failed by then are sent again
+    CLAIM_TIMEOUT = timedelta(minutes=10)
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    html_message = models.TextField(blank=True)
+    recipient = models.CharField(max_length=254)
+    form_response = models.ForeignKey(FormResponse, on_delete=models.SET_NULL,
+                                      blank=True, null=True)
+    status = models.CharField(max_length=1, choices=STATUSES, default='P')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_date = models.DateTimeField(default=timezone.now)
+    created_date = models.DateTimeField(auto_now_add=True)
+    sent_date = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_date"]),
+        ]
+
+    def __str__(self):
+        return "Email {} to {}".format(self.pk, self.recipient)
+
+    def _send(self, connection):
+        email = EmailMultiAlternatives(subject=self.subject,
+                                       body=self.message,
+                                       from_email=settings.DEFAULT_FROM_EMAIL,
+                                       to=[self.recipient],
+                                       connection=connection)
+        if self.html_message:
+            email.attach_alternative(self.html_message, "text/html")
+        email.send()
+
+    @classmethod
+    def claim(cls, batch_size):
+        """ takes the emails that are due away from other workers until
+        `CLAIM_TIMEOUT` is over, only locks them for a short transaction """
+        with transaction.atomic():
+            emails = list(cls.objects
+                          .select_for_update(skip_locked=True)
+                          .filter(status="P", next_attempt_date__lte=timezone.now())
+                          .order_by("next_attempt_date", "id")[:batch_size])
+            cls.objects \
+                .filter(id__in=[email.id for email in emails]) \
+                .update(attempts=models.F("attempts") + 1,
+                        next_attempt_date=timezone.now() + cls.CLAIM_TIMEOUT)
+        for email in emails:
+            email.attempts += 1
+        return emails
+
+    def _failed(self, error):
+        self.last_error = repr(error)
+        if self.attempts >= self.MAX_ATTEMPTS:
+            self.status = "E"
+        else:
+            self.next_attempt_date = timezone.now() + self.RETRY_DELAY * 2 ** (self.attempts - 1)
+        self.save(update_fields=["status", "last_error", "next_attempt_date"])
+
+    @classmethod
+    def send_batch(cls, connection, batch_size=50):
+        """ sends the emails that are due over an open connection and returns
+        how many were handled. Each one is marked as sent right after it was,
+        so if the worker dies only the email it was sending goes out twice. """
+        emails = cls.claim(batch_size)
+        for index, email in enumerate(emails):
+            try:
+                email._send(connection)
+            except Exception as e:
+                email._failed(e)
+                # the server might have hung up, reconnect for the next one
+                connection.close()
+                try:
+                    connection.open()
+                except OSError:
+                    # the others were not attempted, hand them back
+                    cls.objects \
+                        .filter(id__in=[other.id for other in emails[index + 1:]]) \
+                        .update(attempts=models.F("attempts") - 1, next_attempt_date=timezone.now())
+                    raise
+            else:
+                email.status = "S"
+                email.sent_date = timezone.now()
+                email.save(update_fields=["status", "sent_date"])
+        return len(emails)
+
+    @classmethod
+    def send_pending(cls, batch_size=50):
+        """ sends everything that is due over one connection to the mail server """
+        total = 0
+        with get_connection() as connection:
+            while True:
+                sent = cls.send_batch(connection, batch_size)
+                total += sent
+                if sent < batch_size:
+                    return total
@@ -0,0 +1,129 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# use the planner's estimate instead of counting if it expects more rows
+EXACT_COUNT_LIMIT = 10000
+
+
+def estimate_count(queryset):
+    """ number of rows postgres' planner expects the queryset to return """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) {}".format(sql), params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]["Plan Rows"]
+
+
+def count(queryset, limit=EXACT_COUNT_LIMIT):
+    """ returns the number of rows and whether it is exact, only
+    counts them if the planner does not expect more than `limit` """
+    estimate = estimate_count(queryset)
+    if estimate > limit:
+        return estimate, False
+    return queryset.count(), True
+
+
+def encode_cursor(sort_value, pk):
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    elif isinstance(sort_value, Decimal):
+        sort_value = str(sort_value)
+    else:
+        sort_value = repr(float(sort_value))
+    value = "{}|{}".format(sort_value, pk)
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """ returns the sort value and id a cursor points to, raises
+    a ValueError if it is not a valid cursor """
+    try:
+        sort_value, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        parsed = parse_datetime(sort_value)
+        if parsed is None:
+            # exact, whether it was a decimal or the repr of a float
+            parsed = Decimal(sort_value)
+    except (TypeError, UnicodeDecodeError, binascii.Error, InvalidOperation) as e:
+        raise ValueError(cursor) from e
+    return parsed, int(pk)
+
+
+class KeysetPage(object):
+    def __init__(self, object_list, has_next, has_previous, sort_key):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.sort_key = sort_key
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _cursor(self, obj):
+        return encode_cursor(getattr(obj, self.sort_key), obj.pk)
+
+    @property
+    def next_cursor(self):
+        if self.has_next:
+            return self._cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous:
+            return self._cursor(self.object_list[0])
+
+
+class KeysetPaginator(object):
+    """
+    Seek pagination over a queryset from the highest to the lowest value of
+    an annotated, not necessarily unique, datetime or number `sort_key`, with
+    the id as tie breaker. Unlike OFFSET pagination, late pages cost the same as
+    the first one, as long as an index on (sort key, id) backs the filter.
+    """
+
+    def __init__(self, queryset, sort_key, per_page):
+        self.queryset = queryset
+        self.sort_key = sort_key
+        self.per_page = per_page
+
+    def page(self, after=None, before=None):
+        if before:
+            sort_value, pk = decode_cursor(before)
+            # the first condition only narrows the index range to scan
+            queryset = self.queryset \
+                .filter(**{"{}__gte".format(self.sort_key): sort_value}) \
+                .filter(Q(**{"{}__gt".format(self.sort_key): sort_value}) | Q(id__gt=pk)) \
+                .order_by(self.sort_key, "id")
+            object_list = list(queryset[:self.per_page + 1])
+            has_previous = len(object_list) > self.per_page
+            object_list = object_list[:self.per_page][::-1]
+            return KeysetPage(object_list, has_next=True, has_previous=has_previous,
+                              sort_key=self.sort_key)
+
+        object_list = list(self.after(after))
+        has_next = len(object_list) > self.per_page
+        return KeysetPage(object_list[:self.per_page], has_next=has_next, has_previous=bool(after),
+                          sort_key=self.sort_key)
+
+    def after(self, cursor=None):
+        """ the queryset of the page after `cursor`, with one extra entry
+        that tells whether there is a next page """
+        queryset = self.queryset
+        if cursor:
+            sort_value, pk = decode_cursor(cursor)
+            # the first condition only narrows the index range to scan
+            queryset = queryset \
+                .filter(**{"{}__lte".format(self.sort_key): sort_value}) \
+                .filter(Q(**{"{}__lt".format(self.sort_key): sort_value}) | Q(id__lt=pk))
+        return queryset.order_by("-{}".format(self.sort_key), "-id")[:self.per_page + 1]
@@ -24,3 +24,8 @@ def user_role_for_investigation(user, investigation):
         return user_group.role
     except ObjectDoesNotExist:
         return None
+
+
+@register.filter
+def get_item(dictionary, key):
+    return dictionary.get(key)
@@ -3,10 +3,11 @@ from unittest.mock import patch
 from django.http import Http404
 from django.test import TestCase, Client
 from django.urls import reverse
+from rest_framework.test import APITestCase
 
 from forms.admin_views import _get_file_data
-from forms.models import User
-from forms.tests.factories import FormResponseFactory
+from forms.models import FormResponse, User
+from forms.tests.factories import FormInstanceFactory, FormResponseFactory
 
 
 class APIFormReponseCreateTest(TestCase):
@@ -23,3 +24,44 @@ class APIFormReponseCreateTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 405)
 
+
+class APIFormResponseValidationTest(APITestCase):
+    def setUp(self):
+        self.form_instance = FormInstanceFactory.create(form_json=[{
+            "schema": {
+                "slug": "first",
+                "properties": {
+                    "name": {"type": "string"},
+                    "email": {"type": "string", "format": "email"},
+                    "age": {"type": "integer", "minimum": 0},
+                }
+            }
+        }])
+        form = self.form_instance.form
+        self.url = reverse("form_response", kwargs={"investigation_slug": form.investigation.slug,
+                                                    "form_slug": form.slug})
+
+    def submit(self, json):
+        return self.client.post(self.url, {"form_instance": self.form_instance.id, "json": json},
+                                format="json")
+
+    def test_valid_submission(self):
+        response = self.submit({"name": "Peter", "email": "peter@example.com", "age": 42})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(FormResponse.objects.get().json["age"], 42)
+
+    def test_invalid_submission(self):
+        response = self.submit({"name": 42, "email": "peter", "age": -1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["json"], [
+            "age: -1 is less than the minimum of 0",
+            "email: 'peter' is not a 'email'",
+            "name: 42 is not of type 'string'",
+        ])
+        self.assertFalse(FormResponse.objects.exists())
+
+    def test_submission_must_be_an_object(self):
+        response = self.submit(["Peter"])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(FormResponse.objects.exists())
+
@@ -0,0 +1,278 @@
+import base64
+import io
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from forms.models import (INVESTIGATION_ROLES, Attachment, AttachmentBlob,
+                          AttachmentPreview, FormResponse)
+from forms.tests.factories import FormInstanceFactory, FormResponseFactory, UserFactory
+
+GIF = "data:image/gif;name=spacer.gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAQAIBRAA7"
+
+
+def make_jpeg(width, height):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(output, "JPEG")
+    return "data:image/jpeg;name=photo.jpg;base64,{}".format(base64.b64encode(output.getvalue()).decode())
+
+
+class AttachmentTest(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.form_instance = FormInstanceFactory.create(form_json=[{
+            "schema": {
+                "slug": "first",
+                "properties": {
+                    "name": {"type": "string"},
+                    "photo": {"type": "string", "format": "data-url"},
+                    "photos": {"type": "array", "items": {"type": "string", "format": "data-url"}},
+                }
+            }
+        }])
+        self.form = self.form_instance.form
+        self.owner = UserFactory.create()
+        self.form.investigation.add_user(self.owner, INVESTIGATION_ROLES.OWNER)
+
+    def file_url(self, form_response, field, index=None):
+        kwargs = {"investigation_slug": self.form.investigation.slug,
+                  "form_slug": self.form.slug,
+                  "response_id": form_response.id,
+                  "file_field": field}
+        if index is None:
+            return reverse("response_file", kwargs=kwargs)
+        kwargs["file_index"] = index
+        return reverse("response_file_array", kwargs=kwargs)
+
+    def submit(self, json):
+        url = reverse("form_response", kwargs={"investigation_slug": self.form.investigation.slug,
+                                               "form_slug": self.form.slug})
+        response = self.client.post(url, {"form_instance": self.form_instance.id, "json": json},
+                                    format="json")
+        self.assertEqual(response.status_code, 201)
+        return FormResponse.objects.get(id=response.data["id"])
+
+    def test_submission_stores_attachment(self):
+        form_response = self.submit({"name": "Peter", "photo": GIF})
+
+        attachment = form_response.attachments.get()
+        self.assertEqual(form_response.json, {"name": "Peter", "photo": attachment.reference})
+        self.assertEqual(attachment.filename, "spacer.gif")
+        self.assertEqual(attachment.content_type, "image/gif")
+        self.assertEqual(attachment.size, 42)
+        self.assertEqual(len(attachment.blob.sha256), 64)
+
+        self.client.force_login(self.owner)
+        response = self.client.get(self.file_url(form_response, "photo"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/gif")
+        self.assertEqual(response["Content-Disposition"],
+                         'inline; filename="{}-spacer.gif"'.format(form_response.id))
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"GIF89"))
+
+    def test_submission_stores_file_arrays(self):
+        form_response = self.submit({"photos": [GIF, GIF]})
+
+        self.assertEqual(form_response.attachments.count(), 2)
+        self.assertEqual(AttachmentBlob.objects.count(), 1)
+        self.assertTrue(all(Attachment.is_reference(value) for value in form_response.json["photos"]))
+
+        self.client.force_login(self.owner)
+        response = self.client.get(self.file_url(form_response, "photos", 1))
+        self.assertEqual(response.status_code, 200)
+
+    def test_reference_of_other_response(self):
+        form_response = self.submit({"photo": GIF})
+        other_response = FormResponseFactory.create(form_instance=self.form_instance,
+                                                    json={"photo": form_response.json["photo"]})
+
+        self.client.force_login(self.owner)
+        response = self.client.get(self.file_url(other_response, "photo"))
+        self.assertEqual(response.status_code, 404)
+
+    def test_migrate_attachments(self):
+        legacy = FormResponseFactory.create(form_instance=self.form_instance,
+                                            json={"name": "Peter", "photo": GIF, "photos": [GIF]})
+        untouched = FormResponseFactory.create(form_instance=self.form_instance, json={"name": "Katharina"})
+
+        call_command("migrate_attachments", "--batch-size", "1", stdout=tempfile.TemporaryFile(mode="w"))
+
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.attachments.count(), 2)
+        self.assertTrue(Attachment.is_reference(legacy.json["photo"]))
+        self.assertTrue(Attachment.is_reference(legacy.json["photos"][0]))
+        self.assertEqual(legacy.json["name"], "Peter")
+        self.assertEqual(untouched.attachments.count(), 0)
+
+        self.client.force_login(self.owner)
+        response = self.client.get(self.file_url(legacy, "photo"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_migrate_attachments_skips_non_object_json(self):
+        broken = FormResponseFactory.create(form_instance=self.form_instance)
+        FormResponse.objects.filter(id=broken.id).update(json=[GIF])
+        legacy = FormResponseFactory.create(form_instance=self.form_instance, json={"photo": GIF})
+
+        stderr = io.StringIO()
+        call_command("migrate_attachments", stdout=tempfile.TemporaryFile(mode="w"), stderr=stderr)
+
+        broken.refresh_from_db()
+        self.assertEqual(broken.json, [GIF])
+        self.assertIn("Skipped response {}".format(broken.id), stderr.getvalue())
+        self.assertEqual(legacy.attachments.count(), 1)
+
+    def test_identical_files_are_stored_once(self):
+        first = self.submit({"photo": GIF})
+        second = self.submit({"photo": GIF, "photos": [GIF]})
+
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual(blob.attachments.count(), 3)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, "attachments"))), 1)
+        self.assertNotEqual(first.json["photo"], second.json["photo"])
+
+    def test_gc_attachments(self):
+        kept = self.submit({"photo": GIF})
+        removed = self.submit({"photo": "data:text/plain;name=other.txt;base64,aGVsbG8="})
+        removed_blob = removed.attachments.get().blob
+        AttachmentBlob.objects.update(created_date=timezone.now() - timedelta(days=1))
+
+        removed.delete()
+        call_command("gc_attachments", stdout=tempfile.TemporaryFile(mode="w"))
+
+        self.assertFalse(AttachmentBlob.objects.filter(id=removed_blob.id).exists())
+        self.assertFalse(os.path.exists(removed_blob.file.path))
+        kept_blob = kept.attachments.get().blob
+        self.assertTrue(os.path.exists(kept_blob.file.path))
+
+    def test_gc_attachments_deletes_files_of_rolled_back_uploads(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            blob = AttachmentBlob.get_or_create_for_content(b"never committed")
+            raise IntegrityError
+        path = blob.file.path
+        self.assertTrue(os.path.exists(path))
+
+        call_command("gc_attachments", stdout=tempfile.TemporaryFile(mode="w"))
+        self.assertTrue(os.path.exists(path))
+
+        two_hours_ago = (timezone.now() - timedelta(hours=2)).timestamp()
+        os.utime(path, (two_hours_ago, two_hours_ago))
+        call_command("gc_attachments", stdout=tempfile.TemporaryFile(mode="w"))
+        self.assertFalse(os.path.exists(path))
+
+    def test_gc_attachments_keeps_recent_files(self):
+        self.submit({"photo": GIF}).delete()
+
+        call_command("gc_attachments", stdout=tempfile.TemporaryFile(mode="w"))
+
+        self.assertEqual(AttachmentBlob.objects.count(), 1)
+
+    def test_thumbnail(self):
+        form_response = self.submit({"photo": make_jpeg(800, 400)})
+        self.client.force_login(self.owner)
+
+        response = self.client.get(self.file_url(form_response, "photo"), {"size": "thumbnail"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        image = Image.open(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(image.size, (160, 80))
+
+        preview = AttachmentPreview.objects.get()
+        self.assertEqual((preview.size, preview.width, preview.height), ("thumbnail", 160, 80))
+
+        # the preview is only rendered once
+        etag = response["ETag"]
+        response = self.client.get(self.file_url(form_response, "photo"), {"size": "thumbnail"})
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(AttachmentPreview.objects.count(), 1)
+
+    def test_unknown_preview_size(self):
+        form_response = self.submit({"photo": make_jpeg(800, 400)})
+        self.client.force_login(self.owner)
+
+        response = self.client.get(self.file_url(form_response, "photo"), {"size": "huge"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_preview_of_other_files(self):
+        form_response = self.submit({"photo": "data:text/plain;name=notes.txt;base64,aGVsbG8="})
+        self.client.force_login(self.owner)
+
+        response = self.client.get(self.file_url(form_response, "photo"), {"size": "thumbnail"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"hello")
+        self.assertEqual(AttachmentPreview.objects.count(), 0)
+
+    def test_previews_in_admin(self):
+        form_response = self.submit({"name": "Peter", "photos": [make_jpeg(10, 10)]})
+        attachment = form_response.attachments.get()
+        self.client.force_login(self.owner)
+
+        self.assertEqual(form_response.image_attachments_by_json_name(), {"photos-0": attachment})
+
+        response = self.client.get(reverse("response_details", kwargs={
+            "investigation_slug": self.form.investigation.slug,
+            "form_slug": self.form.slug,
+            "response_id": form_response.id}))
+        self.assertContains(response, "{}?size=preview".format(self.file_url(form_response, "photos", 0)))
+
+        thumbnail_url = "{}?size=thumbnail".format(reverse("response_attachment", kwargs={
+            "investigation_slug": self.form.investigation.slug,
+            "form_slug": self.form.slug,
+            "response_id": form_response.id,
+            "attachment_id": attachment.id}))
+        response = self.client.get(reverse("form_responses", kwargs={
+            "investigation_slug": self.form.investigation.slug,
+            "form_slug": self.form.slug,
+            "bucket": "inbox"}))
+        self.assertContains(response, thumbnail_url)
+
+        response = self.client.get(thumbnail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+
+
+class AttachmentGarbageCollectionTest(TransactionTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def test_upload_of_orphaned_content_during_gc(self):
+        with transaction.atomic():
+            AttachmentBlob.get_or_create_for_content(b"hello")
+        AttachmentBlob.objects.update(created_date=timezone.now() - timedelta(days=1))
+
+        def gc():
+            try:
+                call_command("gc_attachments", stdout=tempfile.TemporaryFile(mode="w"))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            blob = AttachmentBlob.get_or_create_for_content(b"hello")
+            thread = threading.Thread(target=gc)
+            thread.start()
+            # gc waits for the upload instead of deleting the blob under it
+            thread.join(1)
+            self.assertTrue(thread.is_alive())
+            Attachment.objects.create(blob=blob, filename="hello.txt", content_type="text/plain")
+        thread.join()
+
+        self.assertTrue(AttachmentBlob.objects.filter(id=blob.id).exists())
+        self.assertTrue(os.path.exists(blob.file.path))
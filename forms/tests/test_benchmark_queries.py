@@ -0,0 +1,28 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from forms.tests.factories import FormInstanceFactory, FormResponseFactory
+
+
+class BenchmarkQueriesTest(TestCase):
+    def test_shows_plans(self):
+        form_instance = FormInstanceFactory.create()
+        FormResponseFactory.create_batch(3, form_instance=form_instance)
+        FormResponseFactory.create()
+
+        output = io.StringIO()
+        call_command("benchmark_queries", "--repeat", "1", stdout=output)
+        output = output.getvalue()
+
+        self.assertIn("Form '{}'".format(form_instance.form.slug), output)
+        for name in ["inbox_first_page", "inbox_middle_page", "form_instance_inbox",
+                     "email_search", "has_field"]:
+            self.assertIn("\n{}: median".format(name), output)
+        self.assertIn("Execution Time", output)
+
+    def test_unknown_form(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_queries", "--form", "nothing", stdout=io.StringIO())
@@ -0,0 +1,152 @@
+import threading
+
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITransactionTestCase
+
+from forms.models import INVESTIGATION_ROLES, FormResponse
+from forms.tests.factories import FormInstanceFactory, FormResponseFactory, UserFactory
+
+
+class ChangesFeedTest(APITransactionTestCase):
+    # changes only show up once their transaction committed
+    def setUp(self):
+        self.form_instance = FormInstanceFactory.create(form_json=[{
+            "schema": {
+                "slug": "first",
+                "properties": {
+                    "name": {"type": "string"},
+                }
+            }
+        }])
+        self.form = self.form_instance.form
+        self.investigation = self.form.investigation
+        self.owner = UserFactory.create()
+        self.investigation.add_user(self.owner, INVESTIGATION_ROLES.OWNER)
+        self.responses = [FormResponseFactory.create(form_instance=self.form_instance, json={"name": name})
+                          for name in ["Peter", "Katharina", "Paula"]]
+        self.url = reverse("form_changes", kwargs={"form_slug": self.form.slug})
+        self.client.force_login(self.owner)
+
+    def get_changes(self, since, url=None):
+        response = self.client.get(url or self.url, {"since": since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_needs_permission(self):
+        viewer = UserFactory.create()
+        self.investigation.add_user(viewer, INVESTIGATION_ROLES.VIEWER)
+        self.client.force_login(viewer)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_pages_through_changes(self):
+        FormResponseFactory.create(json={"name": "Other form"})
+
+        response = self.client.get(self.url, {"limit": 2})
+        self.assertEqual([result["json"]["name"] for result in response.data["results"]], ["Peter", "Katharina"])
+        self.assertTrue(response.data["has_more"])
+
+        data = self.get_changes(response.data["cursor"])
+        self.assertEqual([result["json"]["name"] for result in data["results"]], ["Paula"])
+        self.assertFalse(data["has_more"])
+
+        self.assertIn("change_sequence", data["results"][0])
+        self.assertNotIn("change_transaction", data["results"][0])
+
+        cursor = data["cursor"]
+        self.assertEqual(self.get_changes(cursor), {"results": [], "cursor": cursor, "has_more": False})
+
+    def test_sequence_is_assigned_on_save(self):
+        with self.assertNumQueries(0):
+            form_response = FormResponse(form_instance=self.form_instance, json={"name": "Paul"},
+                                         submission_date=timezone.now())
+        form_response.save()
+        self.assertGreater(form_response.change_sequence, self.responses[-1].change_sequence)
+
+    def test_changes_advance_the_sequence(self):
+        peter, katharina, paula = self.responses
+        cursor = self.get_changes(0)["cursor"]
+
+        katharina.tags.add(self.investigation.tag_set.create(name="important"))
+        self.assertEqual([result["id"] for result in self.get_changes(cursor)["results"]], [katharina.id])
+        cursor = self.get_changes(cursor)["cursor"]
+
+        response = self.client.patch(reverse("form_response_edit", kwargs={"response_id": paula.id}),
+                                     {"status": "V"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["status"] for result in self.get_changes(cursor)["results"]], ["V"])
+        cursor = self.get_changes(cursor)["cursor"]
+
+        response = self.client.post(reverse("response_json_edit", kwargs={
+            "investigation_slug": self.investigation.slug,
+            "form_slug": self.form.slug,
+            "response_id": peter.id}), {"json__name": "Pete"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual([result["json"]["name"] for result in self.get_changes(cursor)["results"]], ["Pete"])
+        cursor = self.get_changes(cursor)["cursor"]
+
+        response = self.client.post(reverse("form_responses_edit", kwargs={
+            "investigation_slug": self.investigation.slug,
+            "form_slug": self.form.slug}), {"selected_responses": [peter.id, katharina.id],
+                                            "action": "mark_invalid"})
+        self.assertEqual(response.status_code, 302)
+        changes = self.get_changes(cursor)["results"]
+        self.assertEqual({result["id"] for result in changes}, {peter.id, katharina.id})
+        self.assertEqual({result["status"] for result in changes}, {"I"})
+
+    def test_investigation_feed(self):
+        other_form_instance = FormInstanceFactory.create(form__investigation=self.investigation)
+        FormResponseFactory.create(form_instance=other_form_instance)
+        FormResponseFactory.create()
+
+        url = reverse("investigation_changes", kwargs={"investigation_slug": self.investigation.slug})
+        self.assertEqual(len(self.get_changes(0, url=url)["results"]), 4)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"since": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_limit(self):
+        for limit in ["-5", "0", "1001", "ten"]:
+            response = self.client.get(self.url, {"limit": limit})
+            self.assertEqual(response.status_code, 400, limit)
+
+    def test_overlapping_transactions(self):
+        cursor = self.get_changes(0)["cursor"]
+        saved, finish = threading.Event(), threading.Event()
+
+        def slow_submission():
+            try:
+                with transaction.atomic():
+                    FormResponseFactory.create(form_instance=self.form_instance, json={"name": "Slow"})
+                    saved.set()
+                    finish.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=slow_submission)
+        thread.start()
+        self.assertTrue(saved.wait(10))
+
+        # committed, but after a change of a transaction that is still running. Another
+        # status, so it does not wait for the submission count the other one locked
+        FormResponseFactory.create(form_instance=self.form_instance, json={"name": "Fast"}, status="V")
+        data = self.get_changes(cursor)
+        self.assertEqual(data["results"], [])
+        self.assertEqual(data["cursor"], cursor)
+
+        finish.set()
+        thread.join()
+        data = self.get_changes(cursor)
+        self.assertEqual([result["json"]["name"] for result in data["results"]], ["Slow", "Fast"])
+
+    def test_save_with_update_fields(self):
+        form_response = self.responses[0]
+        sequence = form_response.change_sequence
+        form_response.json = {"name": "Pete"}
+        form_response.save(update_fields=["json"])
+
+        self.assertGreater(FormResponse.objects.get(id=form_response.id).change_sequence, sequence)
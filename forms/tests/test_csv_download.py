@@ -14,8 +14,8 @@ class FormReponseCSVDownloadTest(TestCase):
         self.investigation = self.form_instance.form.investigation
         self.investigation.add_user(self.owner, INVESTIGATION_ROLES.OWNER)
 
-    @patch('forms.admin_views.create_form_csv', return_value=None)
-    def test_file_download(self, mock_create_form_csv):
+    @patch('forms.admin_views.iter_form_csv', return_value=iter([]))
+    def test_file_download(self, mock_iter_form_csv):
         self.client.force_login(self.owner)
 
         form_instance = self.form_instance
@@ -29,8 +29,8 @@ class FormReponseCSVDownloadTest(TestCase):
         self.assertEquals(response['Content-Disposition'], 'attachment; filename="{}"'.format(filename))
         self.assertEquals(response['Content-Type'], 'text/csv')
 
-    @patch('forms.admin_views.create_form_csv', return_value=None)
-    def test_file_download_fails_if_not_logged_in(self, mock_create_form_csv):
+    @patch('forms.admin_views.iter_form_csv', return_value=iter([]))
+    def test_file_download_fails_if_not_logged_in(self, mock_iter_form_csv):
         form_instance = self.form_instance
         response = self.client.get(reverse("form_responses_csv",
                                            kwargs={"form_slug": form_instance.form.slug,
@@ -39,8 +39,8 @@ class FormReponseCSVDownloadTest(TestCase):
         self.assertEquals(response.status_code, 302)
         self.assertTrue(response.url.startswith("/admin/login"))
 
-    @patch('forms.admin_views.create_form_csv', return_value=None)
-    def test_file_download_fails_for_wrong_investigation(self, mock_create_form_csv):
+    @patch('forms.admin_views.iter_form_csv', return_value=iter([]))
+    def test_file_download_fails_for_wrong_investigation(self, mock_iter_form_csv):
         other_owner = UserFactory.create()
         other_investigation = InvestigationFactory.create()
         other_investigation.add_user(other_owner, INVESTIGATION_ROLES.OWNER)
@@ -54,8 +54,8 @@ class FormReponseCSVDownloadTest(TestCase):
                                                    "bucket": "inbox"}))
         self.assertEquals(response.status_code, 403)
 
-    @patch('forms.admin_views.create_form_csv', return_value=None)
-    def test_file_download_fails_for_viewer(self, mock_create_form_csv):
+    @patch('forms.admin_views.iter_form_csv', return_value=iter([]))
+    def test_file_download_fails_for_viewer(self, mock_iter_form_csv):
         viewer = UserFactory.create()
         self.investigation.add_user(viewer, "V")
         self.client.force_login(viewer)
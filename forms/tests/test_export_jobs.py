@@ -0,0 +1,153 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from forms.models import ExportJob, INVESTIGATION_ROLES
+from forms.tests.factories import FormInstanceFactory, FormResponseFactory, UserFactory
+
+
+def make_url(form, **params):
+    url = reverse("form_exports", kwargs={"form_slug": form.slug})
+    query = "&".join("{}={}".format(key, value) for key, value in params.items())
+    return "{}?{}".format(url, query)
+
+
+class ExportJobAPITest(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.form_instance = FormInstanceFactory.create(form_json=[{
+            "schema": {
+                "slug": "first",
+                "properties": {
+                    "name": {"type": "string"},
+                }
+            }
+        }])
+        self.form = self.form_instance.form
+        self.editor = UserFactory.create()
+        self.form.investigation.add_user(self.editor, INVESTIGATION_ROLES.EDITOR)
+
+        self.response = FormResponseFactory.create(form_instance=self.form_instance,
+                                                   json={"name": "Peter"})
+        FormResponseFactory.create(form_instance=self.form_instance,
+                                   json={"name": "Katharina"},
+                                   status="V")
+
+    def test_viewer_cannot_export(self):
+        viewer = UserFactory.create()
+        self.form.investigation.add_user(viewer, INVESTIGATION_ROLES.VIEWER)
+        self.client.force_login(viewer)
+
+        response = self.client.post(make_url(self.form, bucket="inbox"))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(ExportJob.objects.count(), 0)
+
+    def test_export(self):
+        self.client.force_login(self.editor)
+
+        response = self.client.post(make_url(self.form, bucket="inbox"))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["status"], "P")
+        self.assertIsNone(response.data["download_url"])
+
+        call_command("run_export_jobs", "--once", stdout=tempfile.TemporaryFile(mode="w"))
+
+        response = self.client.get(reverse("export", kwargs={"pk": response.data["id"]}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "F")
+        self.assertEqual(response.data["progress"], 1)
+        self.assertEqual(response.data["total"], 1)
+
+        response = self.client.get(response.data["download_url"])
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode("utf-8").split("\r\n")
+        self.assertTrue(lines[0].startswith("meta_comments"))
+        self.assertTrue(lines[1].endswith("Peter"))
+        self.assertEqual(lines[2], "")
+
+    def test_finished_export_is_reused(self):
+        self.client.force_login(self.editor)
+
+        job_id = self.client.post(make_url(self.form, bucket="inbox")).data["id"]
+        call_command("run_export_jobs", "--once", stdout=tempfile.TemporaryFile(mode="w"))
+
+        response = self.client.post(make_url(self.form, bucket="inbox"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["id"], job_id)
+
+        # other filters need their own export
+        response = self.client.post(make_url(self.form, bucket="verified"))
+        self.assertEqual(response.status_code, 201)
+
+    def test_changed_responses_need_new_export(self):
+        self.client.force_login(self.editor)
+
+        job_id = self.client.post(make_url(self.form, bucket="inbox")).data["id"]
+        call_command("run_export_jobs", "--once", stdout=tempfile.TemporaryFile(mode="w"))
+
+        tag = self.form.investigation.tag_set.create(name="new")
+        self.response.tags.add(tag)
+
+        response = self.client.post(make_url(self.form, bucket="inbox"))
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response.data["id"], job_id)
+
+    def test_renamed_tag_needs_new_export(self):
+        self.client.force_login(self.editor)
+        tag = self.form.investigation.tag_set.create(name="new")
+        self.response.tags.add(tag)
+
+        job_id = self.client.post(make_url(self.form, bucket="inbox")).data["id"]
+        call_command("run_export_jobs", "--once", stdout=tempfile.TemporaryFile(mode="w"))
+
+        tag.name = "renamed"
+        tag.save()
+
+        response = self.client.post(make_url(self.form, bucket="inbox"))
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response.data["id"], job_id)
+
+    def test_stale_export_is_reclaimed(self):
+        self.client.force_login(self.editor)
+        job_id = self.client.post(make_url(self.form, bucket="inbox")).data["id"]
+        self.assertEqual(ExportJob.claim_next().id, job_id)
+
+        # the worker is still alive
+        self.assertIsNone(ExportJob.claim_next())
+
+        # the worker died
+        ExportJob.objects.filter(id=job_id) \
+            .update(heartbeat_date=timezone.now() - ExportJob.STALE_AFTER - timedelta(seconds=1))
+        self.assertEqual(self.client.post(make_url(self.form, bucket="inbox")).data["id"], job_id)
+
+        call_command("run_export_jobs", "--once", stdout=tempfile.TemporaryFile(mode="w"))
+        self.assertEqual(ExportJob.objects.get(id=job_id).status, "F")
+
+    def test_unfinished_export_cannot_be_downloaded(self):
+        self.client.force_login(self.editor)
+
+        job_id = self.client.post(make_url(self.form, bucket="inbox")).data["id"]
+        response = self.client.get(reverse("export_file", kwargs={"pk": job_id}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_investigation_cannot_see_export(self):
+        self.client.force_login(self.editor)
+        job_id = self.client.post(make_url(self.form, bucket="inbox")).data["id"]
+
+        other_editor = UserFactory.create()
+        FormInstanceFactory.create().form.investigation.add_user(other_editor, INVESTIGATION_ROLES.EDITOR)
+        self.client.force_login(other_editor)
+
+        response = self.client.get(reverse("export", kwargs={"pk": job_id}))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,109 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from forms.admin_views import get_facets
+from forms.models import INVESTIGATION_ROLES, FormResponse
+from forms.tests.factories import FormInstanceFactory, FormResponseFactory, TagFactory, UserFactory
+
+
+class FacetTestMixin(object):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        form_instance = FormInstanceFactory.create()
+        self.form = form_instance.form
+        investigation = self.form.investigation
+        self.owner, self.editor = UserFactory.create_batch(2)
+        investigation.add_user(self.owner, INVESTIGATION_ROLES.OWNER)
+        investigation.add_user(self.editor, INVESTIGATION_ROLES.EDITOR)
+        self.first_tag, self.second_tag = TagFactory.create_batch(2, investigation=investigation)
+
+        self.inbox = FormResponseFactory.create(form_instance=form_instance)
+        self.inbox.tags.add(self.first_tag)
+        self.inbox.assignees.add(self.owner)
+        self.both_tags = FormResponseFactory.create(form_instance=form_instance)
+        self.both_tags.tags.add(self.first_tag, self.second_tag)
+        self.verified = FormResponseFactory.create(form_instance=form_instance, status="V")
+        self.verified.tags.add(self.second_tag)
+        self.verified.assignees.add(self.owner, self.editor)
+        FormResponseFactory.create(form_instance=form_instance, status="I", json={"email": "peter@example.org"})
+
+
+class FormResponseFacetTest(FacetTestMixin, TestCase):
+    def test_facets(self):
+        with self.assertNumQueries(1):
+            facets = FormResponse.objects.filter(form=self.form).facets()
+        self.assertEqual(facets, {
+            "status": {"S": 2, "V": 1, "I": 1},
+            "tags": {"S": {self.first_tag.id: 2, self.second_tag.id: 1},
+                     "V": {self.second_tag.id: 1}},
+            "assignees": {"S": {self.owner.id: 1},
+                          "V": {self.owner.id: 1, self.editor.id: 1}},
+        })
+
+    def test_filtered(self):
+        facets = get_facets(self.form, {"bucket": "inbox"}, {"tag": str(self.second_tag.id)})
+        self.assertEqual(facets, {
+            "status": {"S": 1, "V": 1},
+            "tags": {self.first_tag.id: 1, self.second_tag.id: 1},
+            "assignees": {},
+        })
+
+        facets = get_facets(self.form, {"bucket": "trash"}, {"email": "peter"})
+        self.assertEqual(facets, {"status": {"I": 1}, "tags": {}, "assignees": {}})
+
+    def test_unfiltered_are_cached(self):
+        get_facets(self.form, {"bucket": "inbox"}, {})
+        with self.assertNumQueries(0):
+            facets = get_facets(self.form, {"bucket": "inbox"}, {})
+        self.assertEqual(facets["status"], {"S": 2, "V": 1, "I": 1})
+
+        self.both_tags.assignees.add(self.editor)
+        facets = get_facets(self.form, {"bucket": "inbox"}, {})
+        self.assertEqual(facets["assignees"], {self.owner.id: 1, self.editor.id: 1})
+
+        FormResponse.objects.filter(id=self.both_tags.id).set_status("V")
+        facets = get_facets(self.form, {"bucket": "inbox"}, {})
+        self.assertEqual(facets["status"], {"S": 1, "V": 2, "I": 1})
+        self.assertEqual(facets["tags"], {self.first_tag.id: 1})
+
+    @patch('webpack_loader.loader.WebpackLoader.get_bundle')
+    def test_list_view(self, *args):
+        self.client.force_login(self.owner)
+        url = reverse("form_responses", kwargs={"investigation_slug": self.form.investigation.slug,
+                                                "form_slug": self.form.slug,
+                                                "bucket": "verified"})
+        response = self.client.get(url, {"assignee": self.editor.email})
+        self.assertEqual(response.context_data["facets"]["status"], {"V": 1})
+        self.assertContains(response, "{} (1)".format(self.second_tag.name))
+
+
+class FormResponseFacetAPITest(FacetTestMixin, APITestCase):
+    def test_facets(self):
+        url = reverse("response_facets", kwargs={"form_slug": self.form.slug})
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.owner)
+        response = self.client.get(url, {"bucket": "verified", "assignee": self.editor.email})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "status": {"V": 1},
+            "tags": {str(self.second_tag.id): 1},
+            "assignees": {str(self.owner.id): 1, str(self.editor.id): 1},
+        })
+
+    def test_all_buckets(self):
+        self.client.force_login(self.owner)
+        url = reverse("response_facets", kwargs={"form_slug": self.form.slug})
+        response = self.client.get(url)
+        self.assertEqual(response.json(), {
+            "status": {"S": 2, "V": 1, "I": 1},
+            "tags": {str(self.first_tag.id): 2, str(self.second_tag.id): 2},
+            "assignees": {str(self.owner.id): 2, str(self.editor.id): 1},
+        })
+
+        response = self.client.get(url, {"status": "V"})
+        self.assertEqual(response.json()["tags"], {str(self.second_tag.id): 1})
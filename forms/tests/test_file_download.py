@@ -1,3 +1,4 @@
+import hashlib
 from unittest.mock import patch
 
 from django.http import Http404
@@ -35,7 +36,7 @@ class ResponseFileDownloadTest(TestCase):
         with self.assertRaises(Http404):
             _get_file_data(file_not_base64)
 
-    @patch('forms.admin_views._get_file_data', return_value=("filename.png", "image/png", "c"))
+    @patch('forms.admin_views._get_file_data', return_value=("filename.png", "image/png", b"c"))
     def test_file_download(self, mock_get_file_data):
         form_response = FormResponseFactory.create(json={"file_field": "data:image/png;base64,abc123"},
                                                    form_instance=self.form_instance)
@@ -89,3 +90,54 @@ class ResponseFileDownloadTest(TestCase):
 
         response = self.client.get("/forms/admin/investigations/{}/forms/{}/responses/{}/files/file_field/2".format(other_investigation.slug, self.form.slug,form_response.id))
         self.assertEquals(response.status_code, 403)
+
+
+class ResponseFileConditionalDownloadTest(TestCase):
+    def setUp(self):
+        self.owner = UserFactory.create()
+        investigation = InvestigationFactory.create()
+        investigation.add_user(self.owner, INVESTIGATION_ROLES.OWNER)
+        form = FormFactory.create(investigation=investigation)
+        form_response = FormResponseFactory.create(
+            json={"file_field": "data:text/plain;name=digits.txt;base64,MDEyMzQ1Njc4OQ=="},
+            form_instance=FormInstanceFactory.create(form=form))
+        self.url = "/forms/admin/investigations/{}/forms/{}/responses/{}/files/file_field".format(
+            investigation.slug, form.slug, form_response.id)
+        self.etag = '"{}"'.format(hashlib.sha256(b"0123456789").hexdigest())
+        self.client.force_login(self.owner)
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], "10")
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], self.etag)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"outdated"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_range(self):
+        for range_header, content_range, content in [("bytes=2-4", "bytes 2-4/10", b"234"),
+                                                     ("bytes=7-", "bytes 7-9/10", b"789"),
+                                                     ("bytes=-2", "bytes 8-9/10", b"89"),
+                                                     ("bytes=8-20", "bytes 8-9/10", b"89")]:
+            response = self.client.get(self.url, HTTP_RANGE=range_header)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response["Content-Range"], content_range)
+            self.assertEqual(b"".join(response.streaming_content), content)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_range_of_changed_file(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=2-4", HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
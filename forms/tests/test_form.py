@@ -1,15 +1,21 @@
 import datetime
 from collections import OrderedDict
+from io import StringIO
 
 import pytz
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
 from django.utils import timezone
 
+from forms.models import FormResponse, SubmissionCount, bucket_counts
 from forms.tests.factories import FormResponseFactory, FormInstanceFactory, FormFactory
 
 
 class FormTest(TestCase):
     def setUp(self):
+        self.addCleanup(cache.clear)
         form_instance = FormInstanceFactory.create()
         response_data = [
             (timezone.datetime(2018, 1, 2, tzinfo=pytz.utc), "S"),
@@ -41,3 +47,69 @@ class FormTest(TestCase):
     def test_count_by_bucket(self):
         self.assertDictEqual(self.form.count_by_bucket(), {'I': 1, 'S': 2, 'V': 2})
 
+
+    def test_counts_follow_status_changes(self):
+        form_response = FormResponse.objects.get(status="I")
+        form_response.status = "V"
+        form_response.save()
+        self.assertDictEqual(self.form.count_by_bucket(), {'S': 2, 'V': 3})
+
+        FormResponse.objects.filter(status="V").set_status("S")
+        self.assertDictEqual(self.form.count_by_bucket(), {'S': 5})
+
+        FormResponse.objects.filter(submission_date__date=datetime.date(2018, 1, 1)).delete()
+        self.assertDictEqual(self.form.count_by_bucket(), {'S': 2})
+        self.assertQuerysetEqual(self.form.submissions_by_date(),
+                                 [{'date': datetime.date(2018, 1, 2), 'c': 1},
+                                  {'date': datetime.date(2018, 1, 5), 'c': 1}],
+                                 transform=dict)
+
+    def test_rebuild_submission_counts(self):
+        expected = list(SubmissionCount.objects.order_by("date", "status").values("date", "status", "count"))
+        SubmissionCount.objects.all().delete()
+        self.assertDictEqual(self.form.count_by_bucket(), {})
+
+        call_command("rebuild_submission_counts", stdout=StringIO())
+        self.assertEqual(list(SubmissionCount.objects.order_by("date", "status").values("date", "status", "count")),
+                         expected)
+
+    def test_count_by_bucket_is_cached(self):
+        self.form.count_by_bucket()
+        with self.assertNumQueries(0):
+            self.assertDictEqual(self.form.count_by_bucket(), {'I': 1, 'S': 2, 'V': 2})
+
+        FormResponseFactory.create(form_instance=self.form.forminstance_set.get(), status="S")
+        self.assertDictEqual(self.form.count_by_bucket(), {'I': 1, 'S': 3, 'V': 2})
+
+        FormResponse.objects.filter(status="S").set_status("V")
+        self.assertDictEqual(self.form.count_by_bucket(), {'I': 1, 'V': 5})
+
+    def test_instance_properties_are_cached(self):
+        form_instance = self.form.forminstance_set.get()
+        form_instance.form_json = [{"schema": {"properties": {"name": {"type": "string"}}}}]
+        form_instance.save()
+
+        self.assertEqual(self.form.instance_properties, {"name": "Name"})
+        with self.assertNumQueries(0):
+            self.form.instance_properties
+
+        form_instance.form_json = [{"schema": {"properties": {"email": {"type": "string"}}}}]
+        form_instance.save()
+        self.assertEqual(self.form.instance_properties, {"email": "Email"})
+
+
+class CountCacheCommitTest(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_counts_read_before_commit_are_dropped(self):
+        form_response = FormResponseFactory.create(status="S")
+        form = form_response.form
+        self.assertDictEqual(form.count_by_bucket(), {"S": 1})
+
+        with transaction.atomic():
+            FormResponse.objects.filter(id=form_response.id).set_status("V")
+            # another request reads the counts before the change is committed
+            cache.set(bucket_counts.key(form.id), {"S": 1})
+
+        self.assertDictEqual(form.count_by_bucket(), {"V": 1})
@@ -1,5 +1,9 @@
 from django.test import TestCase
-from forms.tests.factories import FormInstanceFactory
+from django.utils import timezone
+
+from forms.caches import FormInstanceCache
+from forms.models import FormInstance
+from forms.tests.factories import FormInstanceFactory, FormResponseFactory
 
 
 class FormInstanceTestCase(TestCase):
@@ -47,3 +51,78 @@ class FormInstanceTestCase(TestCase):
                     }
                 }
         self.assertEqual(self.form_instance.flat_schema, expected)
+
+    def test_render_plan(self):
+        self.form_instance.priority_fields = ["email"]
+        self.form_instance.save()
+
+        plan = self.form_instance.render_plan
+        self.assertEqual([field.name for field in plan], ["email", "name"])
+        self.assertEqual([field.kind for field in plan], ["text", "text"])
+
+    def test_render_plan_is_cached(self):
+        plan = self.form_instance.render_plan
+        form_instance = FormInstance.objects.get(id=self.form_instance.id)
+        with self.assertNumQueries(0):
+            self.assertIs(form_instance.render_plan, plan)
+
+    def test_render_plan_dropped_on_save(self):
+        plan = self.form_instance.render_plan
+        self.form_instance.form_json[0]["schema"]["properties"]["name"]["title"] = "Your name"
+        self.form_instance.save()
+
+        new_plan = self.form_instance.render_plan
+        self.assertIsNot(new_plan, plan)
+        self.assertEqual(new_plan[0].title, "Your name")
+
+    def test_render_plan_changed_by_other_process(self):
+        plan = self.form_instance.render_plan
+        form_json = self.form_instance.form_json
+        form_json[0]["schema"]["properties"]["name"]["title"] = "Your name"
+        # like a save in another process, which does not clear this one's caches
+        FormInstance.objects.filter(id=self.form_instance.id) \
+            .update(form_json=form_json, last_changed_date=timezone.now())
+
+        form_instance = FormInstance.objects.get(id=self.form_instance.id)
+        self.assertIsNot(form_instance.render_plan, plan)
+        self.assertEqual(form_instance.render_plan[0].title, "Your name")
+
+    def test_form_instance_cache_is_bounded(self):
+        cache = FormInstanceCache(lambda form_instance: object(), maxsize=2)
+        FormInstanceCache.registry.remove(cache)
+        first, second, third = FormInstanceFactory.create_batch(3)
+
+        first_value = cache.get(first)
+        cache.get(second)
+        cache.get(first)
+        cache.get(third)
+
+        # `second` was used least recently and is dropped
+        self.assertEqual(list(cache._entries.keys()),
+                         [(first.id, first.last_changed_date), (third.id, third.last_changed_date)])
+        self.assertIs(cache.get(first), first_value)
+
+    def test_compiled_template_is_cached(self):
+        self.form_instance.redirect_url_template = "https://example.com/{{ response.name }}"
+        self.form_instance.save()
+
+        template = self.form_instance.compiled_template("redirect_url_template")
+        form_instance = FormInstance.objects.get(id=self.form_instance.id)
+        self.assertIs(form_instance.compiled_template("redirect_url_template"), template)
+
+        form_instance.redirect_url_template = "https://example.org/{{ response.name }}"
+        form_instance.save()
+        response = FormResponseFactory.create(form_instance=form_instance, json={"name": "Peter"})
+        self.assertEqual(response.redirect_url, "https://example.org/Peter")
+
+    def test_schema_validator_is_cached(self):
+        validator = self.form_instance.schema_validator
+        self.assertTrue(validator.is_valid({"name": "Peter", "email": "peter@example.com"}))
+        self.assertFalse(validator.is_valid({"email": "not an email"}))
+
+        form_instance = FormInstance.objects.get(id=self.form_instance.id)
+        self.assertIs(form_instance.schema_validator, validator)
+
+        form_instance.form_json[0]["schema"]["properties"]["name"]["maxLength"] = 3
+        form_instance.save()
+        self.assertFalse(form_instance.schema_validator.is_valid({"name": "Peter"}))
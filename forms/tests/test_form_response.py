@@ -52,6 +52,24 @@ class FormReponseTest(TestCase):
         expected = []
         self.assertListEqual(list(self.response.rendered_fields()), expected)
 
+    def test_form_follows_form_instance(self):
+        self.assertEqual(self.response.form, self.response.form_instance.form)
+
+        self.response.form_instance = FormInstanceFactory.create()
+        self.response.save(update_fields=["form_instance"])
+        self.response.refresh_from_db()
+        self.assertEqual(self.response.form, self.response.form_instance.form)
+        self.assertEqual(self.response.investigation, self.response.form.investigation)
+
+    def test_investigation_follows_form(self):
+        form = self.response.form_instance.form
+        form.investigation = InvestigationFactory.create()
+        form.save()
+
+        self.response.refresh_from_db()
+        self.assertEqual(self.response.investigation, form.investigation)
+        self.assertTrue(self.response.belongs_to_investigation(form.investigation.slug))
+
     def test_priority_order_rendered_fields(self):
         form_json = [{"schema": {
             "name": "Step 1",
@@ -48,7 +48,7 @@ class FormReponseListViewTest(TestCase):
         response = self.client.get(
             "/forms/admin/investigations/{}/forms/{}/responses/inbox?tag={}".format(form.investigation.slug, form.slug, tag.id))
         self.assertListEqual(
-            list(response.context_data["formresponse_list"].all()),
+            list(response.context_data["formresponse_list"]),
             [form_response]
         )
 
@@ -64,7 +64,7 @@ class FormReponseListViewTest(TestCase):
         response = self.client.get(
             "/forms/admin/investigations/{}/forms/{}/responses/inbox?assignee={}".format(form.investigation.slug, form.slug, user.email))
         self.assertListEqual(
-            list(response.context_data["formresponse_list"].all()),
+            list(response.context_data["formresponse_list"]),
             [form_response]
         )
 
@@ -77,7 +77,7 @@ class FormReponseListViewTest(TestCase):
         response = self.client.get(
             "/forms/admin/investigations/{}/forms/{}/responses/inbox?email=edward@example.com".format(form.investigation.slug, form.slug))
         self.assertListEqual(
-            list(response.context_data["formresponse_list"].all()),
+            list(response.context_data["formresponse_list"]),
             [edwards_response]
         )
 
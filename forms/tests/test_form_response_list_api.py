@@ -1,7 +1,12 @@
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 
-from forms.models import Investigation, UserGroup
+from forms.models import FormResponse, Investigation, UserGroup
 from forms.tests.factories import UserFactory, InvestigationFactory, FormInstanceFactory, FormResponseFactory
 
 
@@ -35,7 +40,7 @@ class FormResponseListAPITest(APITestCase):
 
         response = self.client.get(make_url(self.form_instance))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(response.data["results"]), 10)
 
     def test_owner_cannot_get_other_investigation(self):
         form_instance = FormInstanceFactory.create()
@@ -51,7 +56,7 @@ class FormResponseListAPITest(APITestCase):
         url = "{}?status=S".format(make_url(self.form_instance))
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(response.data["results"]), 5)
 
     def test_files_are_converted_to_urls(self):
         form_instance = FormInstanceFactory.create(form_json=[{
@@ -76,8 +81,99 @@ class FormResponseListAPITest(APITestCase):
 
         response = self.client.get(make_url(form_instance))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["json"]["name"], "Katharina")
+        results = response.data["results"]
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["json"]["name"], "Katharina")
 
         # check that data-url has been converted to a real url for file download
-        self.assertTrue(response.data[0]["json"]["picture"].endswith("/files/picture"))
+        self.assertTrue(results[0]["json"]["picture"].endswith("/files/picture"))
+
+        response = self.client.get(make_url(form_instance), {"fields": "name"})
+        self.assertEqual(response.data["results"][0]["json"], {"name": "Katharina"})
+
+    def test_cursor_pagination(self):
+        self.client.force_login(self.investigation_owner)
+        # responses that were submitted at the same time still get a stable order
+        FormResponse.objects.update(submission_date=timezone.now())
+        expected = list(FormResponse.objects.order_by("id").values_list("id", flat=True))
+
+        ids = []
+        url = "{}?page_size=3".format(make_url(self.form_instance))
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), 3)
+            ids += [result["id"] for result in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(ids, expected)
+
+    def test_queries_per_page_are_constant(self):
+        self.client.force_login(self.investigation_owner)
+        tag = self.form_instance.form.investigation.tag_set.create(name="important")
+        for form_response in FormResponse.objects.all():
+            form_response.tags.add(tag)
+            form_response.assignees.add(self.investigation_owner)
+
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get(make_url(self.form_instance), {"page_size": 2})
+        with CaptureQueriesContext(connection) as large_page:
+            self.client.get(make_url(self.form_instance), {"page_size": 10})
+        self.assertEqual(len(small_page), len(large_page))
+
+
+class FormResponseStreamAPITest(APITestCase):
+    def setUp(self):
+        self.investigation_owner = UserFactory.create()
+        self.form_instance = FormInstanceFactory.create(form_json=[{
+            "schema": {
+                "slug": "first",
+                "properties": {
+                    "name": {"type": "string"},
+                    "email": {"type": "string"},
+                }
+            }
+        }])
+        self.form_instance.form.investigation.add_user(self.investigation_owner, "O")
+        self.url = reverse("responses_ndjson", kwargs={"form_slug": self.form_instance.form.slug})
+
+        for name in ["Peter", "Katharina", "Paula"]:
+            FormResponseFactory.create(form_instance=self.form_instance,
+                                       json={"name": name, "email": "{}@example.org".format(name.lower())})
+        FormResponseFactory.create(form_instance=self.form_instance, json={"name": "Verified"}, status="V")
+        FormResponseFactory.create(form_instance=self.form_instance, json={"name": "Invalid"}, status="I")
+
+    def get_lines(self, params={}):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertTrue(content.endswith("\n"))
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_get_needs_authorization(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_stream(self):
+        self.client.force_login(self.investigation_owner)
+
+        lines = self.get_lines()
+        self.assertEqual([line["json"]["name"] for line in lines],
+                         ["Peter", "Katharina", "Paula", "Verified", "Invalid"])
+        self.assertEqual(lines[0]["json"]["email"], "peter@example.org")
+
+    def test_filters(self):
+        self.client.force_login(self.investigation_owner)
+
+        lines = self.get_lines({"bucket": "verified"})
+        self.assertEqual([line["json"]["name"] for line in lines], ["Verified"])
+
+        lines = self.get_lines({"bucket": "inbox"})
+        self.assertEqual([line["json"]["name"] for line in lines], ["Peter", "Katharina", "Paula"])
+
+        lines = self.get_lines({"status": "I"})
+        self.assertEqual([line["json"]["name"] for line in lines], ["Invalid"])
+
+        lines = self.get_lines({"email": "kath", "fields": "name"})
+        self.assertEqual([line["json"] for line in lines], [{"name": "Katharina"}])
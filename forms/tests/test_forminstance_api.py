@@ -1,3 +1,6 @@
+import gzip
+
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
@@ -105,3 +108,79 @@ class FormInstanceListAPITest(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data.get("results")), 1)
         self.assertEqual(response.data.get("results")[0]["version"], 2)
+
+
+class FormInstanceDetailTest(APITestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.owner = UserFactory.create()
+        self.form_instance = FormInstanceFactory.create(version=1, form_json=[{"schema": {"slug": "first"}}])
+        self.form = self.form_instance.form
+        self.form.investigation.add_user(self.owner, INVESTIGATION_ROLES.OWNER)
+        self.url = reverse("form", kwargs={"investigation_slug": self.form.investigation.slug,
+                                           "form_slug": self.form.slug})
+
+    def test_cached_and_revalidated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 1)
+        etag = response["ETag"]
+        self.assertFalse(response.has_header("Last-Modified"))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_new_version_is_served(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.client.force_login(self.owner)
+        self.client.post(reverse("form_forminstances", kwargs={"form_id": self.form.id}),
+                         {"form_json": [{"schema": {"slug": "second"}}]}, format="json")
+        self.client.logout()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 2)
+
+        self.form.language = "en"
+        self.form.save()
+        self.assertEqual(self.client.get(self.url).json()["language"], "en")
+
+    def test_unknown_form(self):
+        url = reverse("form", kwargs={"investigation_slug": self.form.investigation.slug,
+                                      "form_slug": "nothing"})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_compressed(self):
+        body = self.client.get(self.url).content
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), body)
+        etag = response["ETag"]
+        self.assertNotEqual(etag, self.client.get(self.url)["ETag"])
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, body)
+
+    def test_version_url(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_LANGUAGE="en")
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        version_url = response["Content-Location"]
+        self.assertIn("/versions/en/1-", version_url)
+
+        with self.assertNumQueries(0):
+            version_response = self.client.get(version_url, HTTP_ACCEPT_LANGUAGE="de")
+        self.assertEqual(version_response.status_code, 200)
+        self.assertEqual(version_response.content, response.content)
+        self.assertIn("immutable", version_response["Cache-Control"])
+
+        FormInstanceFactory.create(form=self.form, version=2, form_json=[{"schema": {"slug": "second"}}])
+        self.assertEqual(self.client.get(version_url).status_code, 404)
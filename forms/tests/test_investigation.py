@@ -1,10 +1,16 @@
 from unittest.mock import patch
 
 import pytz
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
 
-from forms.tests.factories import FormResponseFactory, FormInstanceFactory
+from forms.models import INVESTIGATION_ROLES, Investigation, UserGroup
+from forms.tests.factories import (FormInstanceFactory, FormResponseFactory,
+                                   InvestigationFactory, UserFactory)
 
 
 def make_date(day):
@@ -37,3 +43,48 @@ class FormReponseTest(TestCase):
             "to_verify": 1,
         }
         self.assertDictEqual(stats, expected)
+
+    @patch('django.utils.timezone.now', return_value=timezone.datetime(2018, 1, 6, tzinfo=pytz.utc))
+    def test_submission_stats_in_bulk(self, mock_now):
+        other_investigation = InvestigationFactory.create()
+        FormResponseFactory.create(submission_date=make_date(5), status="S",
+                                   form_instance=FormInstanceFactory.create(form__investigation=other_investigation))
+        empty_investigation = InvestigationFactory.create()
+
+        with self.assertNumQueries(1):
+            investigations = Investigation.with_submission_stats(Investigation.objects.order_by("id"))
+            stats = {investigation.id: investigation.submission_stats() for investigation in investigations}
+
+        self.assertEqual(stats, {
+            self.investigation.id: {"total": 4, "yesterday": 1, "to_verify": 1},
+            other_investigation.id: {"total": 1, "yesterday": 1, "to_verify": 1},
+            empty_investigation.id: {"total": 0, "yesterday": 0, "to_verify": 0},
+        })
+
+    def test_investigation_list_queries_stats_once(self):
+        user = UserFactory.create()
+        self.client.force_login(user)
+        for _ in range(3):
+            investigation = InvestigationFactory.create()
+            investigation.add_user(user, INVESTIGATION_ROLES.EDITOR)
+            FormResponseFactory.create(form_instance=FormInstanceFactory.create(form__investigation=investigation))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("investigation_list"))
+        self.assertEqual(response.status_code, 200)
+        stats_queries = [query["sql"] for query in queries.captured_queries
+                         if '"forms_submissioncount"' in query["sql"]]
+        self.assertEqual(len(stats_queries), 1)
+
+    def test_manager_users_are_cached(self):
+        self.addCleanup(cache.clear)
+        editor = UserFactory.create()
+        self.investigation.add_user(editor, INVESTIGATION_ROLES.EDITOR)
+        self.assertEqual(self.investigation.manager_users, [editor])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.investigation.manager_users, [editor])
+
+        UserGroup.objects.get(investigation=self.investigation,
+                              role=INVESTIGATION_ROLES.VIEWER).add_user(editor)
+        self.assertEqual(self.investigation.manager_users, [])
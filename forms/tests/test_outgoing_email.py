@@ -0,0 +1,90 @@
+import io
+from datetime import timedelta
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from forms.models import OutgoingEmail
+from forms.tests.factories import FormResponseFactory
+
+
+class OutgoingEmailTest(TestCase):
+    def setUp(self):
+        self.form_response = FormResponseFactory.create(json={"email": "tester@example.com",
+                                                              "confirm_summary": True})
+
+    def test_submission_only_queues(self):
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.recipient, "tester@example.com")
+        self.assertEqual(email.form_response, self.form_response)
+        self.assertEqual(email.status, "P")
+
+        FormResponseFactory.create(json={"email": "tester@example.com"})
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_send_pending(self):
+        OutgoingEmail.objects.create(subject="Later", message="Not yet", recipient="later@example.com",
+                                     next_attempt_date=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(OutgoingEmail.send_pending(batch_size=1), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["tester@example.com"])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        email = OutgoingEmail.objects.get(form_response=self.form_response)
+        self.assertEqual((email.status, email.attempts), ("S", 1))
+        self.assertIsNotNone(email.sent_date)
+
+    @patch('django.core.mail.EmailMultiAlternatives.send', side_effect=SMTPServerDisconnected("gone"))
+    def test_retries_with_backoff(self, send):
+        email = OutgoingEmail.objects.get()
+        for attempt in range(1, OutgoingEmail.MAX_ATTEMPTS + 1):
+            before = timezone.now()
+            OutgoingEmail.send_pending()
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, attempt)
+            self.assertIn("gone", email.last_error)
+            if attempt < OutgoingEmail.MAX_ATTEMPTS:
+                self.assertEqual(email.status, "P")
+                self.assertGreaterEqual(email.next_attempt_date - before,
+                                        OutgoingEmail.RETRY_DELAY * 2 ** (attempt - 1))
+                # nothing is due until the delay is over
+                OutgoingEmail.send_pending()
+                self.assertEqual(send.call_count, attempt)
+                OutgoingEmail.objects.update(next_attempt_date=timezone.now())
+        self.assertEqual(email.status, "E")
+
+    @patch('django.core.mail.EmailMultiAlternatives.send', side_effect=[None, SystemExit])
+    def test_sent_emails_stay_sent_when_the_worker_dies(self, send):
+        later = OutgoingEmail.objects.create(subject="Later", message="Second", recipient="later@example.com")
+
+        with self.assertRaises(SystemExit):
+            OutgoingEmail.send_pending()
+
+        sent = OutgoingEmail.objects.get(form_response=self.form_response)
+        self.assertEqual(sent.status, "S")
+        # the claim keeps other workers away until it times out
+        later.refresh_from_db()
+        self.assertEqual((later.status, later.attempts), ("P", 1))
+        self.assertGreater(later.next_attempt_date, timezone.now())
+        self.assertEqual(OutgoingEmail.claim(batch_size=10), [])
+
+    @patch('django.core.mail.EmailMultiAlternatives.send', side_effect=[SMTPRecipientsRefused({}), None])
+    def test_failure_does_not_stop_the_batch(self, send):
+        OutgoingEmail.objects.create(subject="Later", message="Second", recipient="later@example.com")
+
+        self.assertEqual(OutgoingEmail.send_pending(), 2)
+
+        statuses = OutgoingEmail.objects.order_by("id").values_list("status", "attempts")
+        self.assertEqual(list(statuses), [("P", 1), ("S", 1)])
+
+    def test_command(self):
+        output = io.StringIO()
+        call_command("send_emails", "--once", stdout=output)
+        self.assertEqual(output.getvalue(), "Handled 1 emails\n")
+        self.assertEqual(len(mail.outbox), 1)
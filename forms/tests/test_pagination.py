@@ -0,0 +1,96 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytz
+from django.db.models.functions import Coalesce
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from forms.models import FormResponse, User
+from forms.pagination import KeysetPaginator, count, decode_cursor, encode_cursor
+from forms.tests.factories import FormInstanceFactory, FormResponseFactory
+
+
+class KeysetPaginatorTest(TestCase):
+    def setUp(self):
+        form_instance = FormInstanceFactory.create()
+        # several responses share a date to make sure the id breaks ties
+        for day in [1, 2, 2, 2, 3, 4, 4]:
+            FormResponseFactory.create(form_instance=form_instance,
+                                       submission_date=timezone.datetime(2020, 1, day, tzinfo=pytz.utc))
+        self.queryset = FormResponse.objects \
+            .annotate(inbox_date=Coalesce('last_status_changed_date', 'submission_date'))
+        self.expected = list(self.queryset.order_by("-inbox_date", "-id"))
+
+    def test_pages_forward_and_back(self):
+        paginator = KeysetPaginator(self.queryset, "inbox_date", 3)
+
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        self.assertEqual([list(page) for page in pages],
+                         [self.expected[0:3], self.expected[3:6], self.expected[6:7]])
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[-1].has_previous)
+
+        previous = paginator.page(before=pages[2].previous_cursor)
+        self.assertEqual(list(previous), self.expected[3:6])
+        self.assertTrue(previous.has_previous)
+        first = paginator.page(before=previous.previous_cursor)
+        self.assertEqual(list(first), self.expected[0:3])
+        self.assertFalse(first.has_previous)
+
+    def test_cursor(self):
+        date = timezone.datetime(2020, 1, 2, 3, 4, 5, tzinfo=pytz.utc)
+        self.assertEqual(decode_cursor(encode_cursor(date, 12)), (date, 12))
+        self.assertEqual(decode_cursor(encode_cursor(Decimal("0.0607927000"), 12)), (Decimal("0.0607927000"), 12))
+        for cursor in ["nonsense", "bm9uc2Vuc2U=", encode_cursor(date, 12)[:-2]]:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_count(self):
+        self.assertEqual(count(self.queryset), (7, True))
+        total, exact = count(self.queryset, limit=0)
+        self.assertFalse(exact)
+        self.assertGreater(total, 0)
+
+
+@patch('webpack_loader.loader.WebpackLoader.get_bundle')
+class FormResponseListPaginationTest(TestCase):
+    def setUp(self):
+        form_instance = FormInstanceFactory.create()
+        self.form = form_instance.form
+        for index in range(30):
+            FormResponseFactory.create(form_instance=form_instance,
+                                       json={"has_car": True} if index % 3 == 0 else {})
+        self.url = reverse("form_responses", kwargs={"investigation_slug": self.form.investigation.slug,
+                                                     "form_slug": self.form.slug,
+                                                     "bucket": "inbox"})
+        User.objects.create_superuser('admin@crowdnewsroom.org', 'password')
+        self.client.login(email='admin@crowdnewsroom.org', password='password')
+
+    def test_pages(self, *args):
+        response = self.client.get(self.url)
+        first_page = response.context_data["formresponse_list"]
+        self.assertEqual(len(first_page), 25)
+        self.assertEqual((response.context_data["total_count"], response.context_data["count_is_exact"]),
+                         (30, True))
+
+        next_cursor = response.context_data["page_obj"].next_cursor
+        self.assertContains(response, "?after={}".format(next_cursor))
+        response = self.client.get(self.url, {"after": next_cursor})
+        self.assertEqual(len(response.context_data["formresponse_list"]), 5)
+        self.assertFalse(response.context_data["page_obj"].has_next)
+
+        response = self.client.get(self.url, {"before": response.context_data["page_obj"].previous_cursor})
+        self.assertEqual(response.context_data["formresponse_list"], first_page)
+
+    def test_filtered_count(self, *args):
+        response = self.client.get(self.url, {"has": "has_car"})
+        self.assertEqual(len(response.context_data["formresponse_list"]), 10)
+        self.assertFalse(response.context_data["is_paginated"])
+
+    def test_invalid_cursor(self, *args):
+        response = self.client.get(self.url, {"after": "nonsense"})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,116 @@
+import io
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from forms.models import INVESTIGATION_ROLES, FormResponse, User
+from forms.tests.factories import FormFactory, FormInstanceFactory, FormResponseFactory, UserFactory
+
+FORM_JSON = [{"schema": {
+    "slug": "step-1",
+    "properties": {
+        "story": {"type": "string"},
+        "place": {"type": "string"},
+        "agree": {"type": "boolean"},
+        "photo": {"type": "string", "format": "data-url"},
+    }
+}}]
+
+
+class SearchTestMixin(object):
+    def setUp(self):
+        form = FormFactory.create(language="en")
+        self.form_instance = FormInstanceFactory.create(form=form, form_json=FORM_JSON)
+        self.river = FormResponseFactory.create(form_instance=self.form_instance, json={
+            "story": "The river is polluted, the pollution comes from the factory",
+            "place": "Rivers near Essen"})
+        self.lake = FormResponseFactory.create(form_instance=self.form_instance, json={
+            "story": "The lake looks polluted", "agree": True})
+        self.bikes = FormResponseFactory.create(form_instance=self.form_instance, json={
+            "story": "Cars are parked on the bike lane", "photo": "data:image/png;base64,cG9sbHV0ZWQ="})
+
+
+class FormResponseSearchTest(SearchTestMixin, TestCase):
+    def test_search_text(self):
+        self.assertEqual(self.bikes.search_text(), "Cars are parked on the bike lane")
+
+    def test_ranked_by_relevance(self):
+        results = FormResponse.objects.search("pollution", "en")
+        self.assertEqual(list(results), [self.river, self.lake])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_matches_across_fields(self):
+        self.assertEqual(list(FormResponse.objects.search("polluted river", "en")), [self.river])
+        self.assertEqual(list(FormResponse.objects.search("pollution", "en").filter(json__has_key="agree")),
+                         [self.lake])
+
+    def test_updated_on_save(self):
+        self.bikes.json = {"story": "Someone polluted the bike lane"}
+        self.bikes.save(update_fields=["json"])
+        self.assertIn(self.bikes, FormResponse.objects.search("pollution", "en"))
+
+    def test_rebuild(self):
+        FormResponse.objects.update(search_vector=None)
+        self.assertFalse(FormResponse.objects.search("pollution", "en").exists())
+
+        output = io.StringIO()
+        call_command("rebuild_search_vectors", stdout=output)
+        self.assertEqual(output.getvalue(), "Indexed 3 responses\n")
+        self.assertEqual(list(FormResponse.objects.search("pollution", "en")), [self.river, self.lake])
+
+
+@patch('webpack_loader.loader.WebpackLoader.get_bundle')
+class FormResponseListSearchTest(SearchTestMixin, TestCase):
+    def test_search(self, *args):
+        User.objects.create_superuser('admin@crowdnewsroom.org', 'password')
+        self.client.login(email='admin@crowdnewsroom.org', password='password')
+        form = self.form_instance.form
+        url = reverse("form_responses", kwargs={"investigation_slug": form.investigation.slug,
+                                                "form_slug": form.slug,
+                                                "bucket": "inbox"})
+
+        response = self.client.get(url, {"q": "pollution"})
+        self.assertEqual(response.context_data["formresponse_list"], [self.river, self.lake])
+        self.assertEqual(response.context_data["q_param"], "pollution")
+
+        response = self.client.get(url, {"q": "unicorns"})
+        self.assertEqual(response.context_data["formresponse_list"], [])
+
+
+class FormResponseListAPISearchTest(SearchTestMixin, APITestCase):
+    def test_search(self):
+        owner = UserFactory.create()
+        self.form_instance.form.investigation.add_user(owner, INVESTIGATION_ROLES.OWNER)
+        self.client.force_login(owner)
+        url = reverse("responses", kwargs={"form_slug": self.form_instance.form.slug})
+
+        response = self.client.get(url, {"q": "pollution", "page_size": 1})
+        self.assertEqual([result["id"] for result in response.data["results"]], [self.river.id])
+        self.assertNotIn("search_vector", response.data["results"][0])
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual([result["id"] for result in response.data["results"]], [self.lake.id])
+        self.assertIsNone(response.data["next"])
+
+    def test_pages_through_ties(self):
+        owner = UserFactory.create()
+        self.form_instance.form.investigation.add_user(owner, INVESTIGATION_ROLES.OWNER)
+        self.client.force_login(owner)
+        for index in range(6):
+            FormResponseFactory.create(form_instance=self.form_instance, json={
+                "story": "pollution " * (index % 3 + 1)})
+        expected = list(FormResponse.objects.search("pollution", "en").values_list("id", flat=True))
+
+        ids = []
+        response = self.client.get(reverse("responses", kwargs={"form_slug": self.form_instance.form.slug}),
+                                   {"q": "pollution", "page_size": 2})
+        while True:
+            ids.extend(result["id"] for result in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(ids), 8)
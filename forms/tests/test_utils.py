@@ -6,8 +6,8 @@ from django.utils.datetime_safe import datetime
 from django.utils.text import slugify
 
 from forms.models import Investigation, Form, FormInstance
-from forms.tests.factories import FormResponseFactory, TagFactory
-from forms.utils import create_form_csv
+from forms.tests.factories import CommentFactory, FormResponseFactory, TagFactory
+from forms.utils import create_form_csv, iter_form_csv
 
 
 @override_settings(LANGUAGE_CODE='en', LANGUAGES=(('en', 'English'),))
@@ -222,3 +222,96 @@ class Utils(TestCase):
         expected_second = "katharina@example.com,,{},Inbox,2018-01-02 00:00:00+00:00,,http://example.com,0,Katharina".format(
             response_2.id)
         self.assertEquals(second, expected_second)
+
+    def test_create_form_csv_header_from_schema(self):
+        buffer = StringIO()
+        build_absolute_uri = lambda x: "http://example.com"
+
+        FormInstance.objects.create(form=self.form,
+                                    form_json=[{
+                                        "schema": {
+                                            "slug": "first",
+                                            "properties": {
+                                                "name": {"type": "string", "title": "Name"},
+                                            }
+                                        }
+                                    }])
+        FormInstance.objects.create(form=self.form,
+                                    version=1,
+                                    form_json=[{
+                                        "schema": {
+                                            "slug": "first",
+                                            "properties": {
+                                                "name": {"type": "string", "title": "Name"},
+                                                "age": {"type": "number"},
+                                            }
+                                        }
+                                    }])
+
+        # columns are known even though there are no responses yet
+        create_form_csv(self.form, self.investigation.slug, build_absolute_uri, buffer)
+        header = buffer.getvalue().split('\r\n')[0]
+        expected_header = "Name,age,meta_comments,meta_id,meta_status,meta_submission_date,meta_tags,meta_url,meta_version"
+        self.assertEquals(header, expected_header)
+
+    def test_iter_form_csv_file_array(self):
+        build_absolute_uri = lambda x: "https://example.com{}".format(x)
+
+        form_instance = FormInstance.objects.create(form=self.form,
+                                                    form_json=[{
+                                                        "schema": {
+                                                            "slug": "first",
+                                                            "properties": {
+                                                                "pictures": {"type": "array",
+                                                                             "title": "Pictures",
+                                                                             "items": {"type": "string",
+                                                                                       "format": "data-url"}},
+                                                            }
+                                                        }
+                                                    }])
+
+        response = FormResponseFactory.create(form_instance=form_instance,
+                                              json={"pictures": ["data-url....", "data-url...."]})
+
+        lines = list(iter_form_csv(self.form, self.investigation.slug, build_absolute_uri))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("Pictures,"))
+
+        base_url = "https://example.com/forms/admin/investigations/first-investigation/forms/first-form/responses/{}".format(
+            response.id)
+        expected_pictures = '"{0}/files/pictures/0, {0}/files/pictures/1"'.format(base_url)
+        self.assertTrue(lines[1].startswith(expected_pictures))
+
+    def test_iter_form_csv_query_count(self):
+        build_absolute_uri = lambda x: "http://example.com"
+
+        form_instance = FormInstance.objects.create(form=self.form,
+                                                    form_json=[{
+                                                        "schema": {
+                                                            "slug": "first",
+                                                            "properties": {
+                                                                "name": {"type": "string"},
+                                                                "picture": {"type": "string",
+                                                                            "format": "data-url"},
+                                                            }
+                                                        }
+                                                    }])
+        tag = TagFactory.create(investigation=self.investigation)
+
+        def create_responses(count):
+            for _ in range(count):
+                response = FormResponseFactory.create(form_instance=form_instance,
+                                                      json={"name": "Peter", "picture": "data-url...."})
+                response.tags.set([tag])
+                CommentFactory.create(form_response=response)
+
+        # instances, responses, tags and comments with their authors
+        create_responses(2)
+        with self.assertNumQueries(4):
+            lines = list(iter_form_csv(self.form, self.investigation.slug, build_absolute_uri))
+        self.assertEqual(len(lines), 3)
+
+        create_responses(8)
+        with self.assertNumQueries(4):
+            lines = list(iter_form_csv(self.form, self.investigation.slug, build_absolute_uri))
+        self.assertEqual(len(lines), 11)
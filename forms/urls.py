@@ -7,14 +7,20 @@ from forms.admin_views import (CommentAddView, CommentDeleteView, FormListView,
                                InvestigationCreateView,
                                InvestigationListView, InvestigationView,
                                UserSettingsView, form_response_batch_edit,
+                               form_response_attachment_view,
                                form_response_csv_view, form_response_file_view,
                                form_response_json_edit_view)
-from forms.views import (AssigneeList, FormCreate, FormDetails,
+from forms.views import (AssigneeList, ExportJobCreate, ExportJobDetail,
+                         ExportJobFile, FormCreate, FormDetails,
                          FormInstanceDetail, FormInstanceListCreate,
+                         FormInstanceVersionDetail,
                          FormInstanceTemplateDetails, FormInstanceTemplateList,
-                         FormResponseCreate, FormResponseDetail,
-                         FormResponseList, InvestigationCreate,
-                         InvestigationDetail, InvitationDetails,
+                         FormResponseChanges, FormResponseCreate,
+                         FormResponseDetail, FormResponseFacets,
+                         FormResponseList,
+                         FormResponseStream, InvestigationCreate,
+                         InvestigationDetail, InvestigationResponseChanges,
+                         InvitationDetails,
                          InvitationList, TagEditDelete, TagList,
                          UserGroupMembershipDelete, UserGroupUserList,
                          UserInvitationList, UserList)
@@ -38,6 +44,8 @@ urlpatterns = [
          InvestigationDetail.as_view(), name="investigation"),
     path('investigations/<slug:investigation_slug>/forms/<slug:form_slug>',
          FormInstanceDetail.as_view(), name="form"),
+    path('investigations/<slug:investigation_slug>/forms/<slug:form_slug>/versions/<language>/<slug:version_key>.json',
+         FormInstanceVersionDetail.as_view(), name="form_version"),
     path('investigations/<slug:investigation_slug>/forms/<slug:form_slug>/responses',
          FormResponseCreate.as_view(), name="form_response"),
     path('responses/<int:response_id>',
@@ -65,8 +73,20 @@ urlpatterns = [
     path('forms/<slug:form_slug>', FormDetails.as_view(), name="form_details"),
     path('forms/<slug:form_slug>/responses',
          FormResponseList.as_view(), name="responses"),
+    path('forms/<slug:form_slug>/changes',
+         FormResponseChanges.as_view(), name="form_changes"),
+    path('investigations/<slug:investigation_slug>/changes',
+         InvestigationResponseChanges.as_view(), name="investigation_changes"),
+    path('forms/<slug:form_slug>/responses.ndjson',
+         FormResponseStream.as_view(), name="responses_ndjson"),
+    path('forms/<slug:form_slug>/facets',
+         FormResponseFacets.as_view(), name="response_facets"),
     path('forms/<int:form_id>/form_instances',
          FormInstanceListCreate.as_view(), name="form_forminstances"),
+    path('forms/<slug:form_slug>/exports',
+         ExportJobCreate.as_view(), name="form_exports"),
+    path('exports/<int:pk>', ExportJobDetail.as_view(), name="export"),
+    path('exports/<int:pk>/file', ExportJobFile.as_view(), name="export_file"),
 
     path('admin/investigations', InvestigationListView.as_view(),
          name="investigation_list"),
@@ -106,4 +126,6 @@ urlpatterns = [
          form_response_file_view, name="response_file"),
     path('admin/investigations/<slug:investigation_slug>/forms/<slug:form_slug>/responses/<int:response_id>/files/<file_field>/<int:file_index>',
          form_response_file_view, name="response_file_array"),
+    path('admin/investigations/<slug:investigation_slug>/forms/<slug:form_slug>/responses/<int:response_id>/attachments/<uuid:attachment_id>',
+         form_response_attachment_view, name="response_attachment"),
 ]
@@ -1,100 +1,183 @@
 import csv
+import logging
+import tempfile
+import uuid
+from urllib.parse import urljoin
 
 import bugsnag
+from django.core.files import File
+from django.db.models import Prefetch, prefetch_related_objects
 from django.urls import reverse
+from django.utils import timezone
 
-from forms.models import FormInstance, FormResponse
+from forms.models import Comment, ExportJob, FormInstance, FormResponse
 
+logger = logging.getLogger(__name__)
+
+# number of rows fetched from the server-side cursor at once
+EXPORT_CHUNK_SIZE = 2000
+
+META_FIELDS = {"url", "version", "status",
+               "submission_date", "id", "tags", "comments"}
+
+
+class Echo:
+    """ file-like object that hands back whatever gets written to it,
+    this allows us to use `csv.writer` to produce single lines"""
+
+    def write(self, value):
+        return value
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _load_related(form_responses, form_instances):
+    """ loads everything the export needs for a chunk of responses in bulk
+    instead of querying it row by row"""
+    for form_response in form_responses:
+        form_response.form_instance = form_instances[form_response.form_instance_id]
+
+    visible_comments = Comment.objects \
+        .filter(archived=False) \
+        .select_related("author") \
+        .order_by("-date")
+    prefetch_related_objects(form_responses,
+                             "tags",
+                             Prefetch("comments", queryset=visible_comments, to_attr="visible_comment_list"))
+
+
+def _get_row(form_response, investigation_slug, form_slug, columns, build_absolute_uri):
+    row = {}
+    for field in form_response.rendered_fields():
+        json_name = field["json_name"]
+        if json_name not in columns:
+            # entries of file arrays are named `<field>-<index>`,
+            # all of them end up in the column of their field
+            json_name = json_name.rpartition("-")[0] or json_name
+        column = columns.get(json_name, field["json_name"])
+        if field['type'] == "link":
+            value = build_absolute_uri(field["value"])
+        else:
+            value = field["value"]
+
+        if column in row:
+            row[column] = "{}, {}".format(row[column], value)
+        else:
+            row[column] = value
+
+    path = reverse("response_details", kwargs={"investigation_slug": investigation_slug,
+                                                "form_slug": form_slug,
+                                                "response_id": form_response.id})
+    url = build_absolute_uri(path)
+    meta_data = {"meta_version": form_response.form_instance.version,
+                 "meta_id": form_response.id,
+                 "meta_url": url,
+                 "meta_status": form_response.get_status_display(),
+                 "meta_submission_date": form_response.submission_date,
+                 "meta_tags": ", ".join([tag.name.replace(",", " ")
+                                         for tag
+                                         in form_response.tags.all()]),
+                 "meta_comments": ", ".join([comment.author.first_name + ' ' + comment.author.last_name + ' (' +
+                                             comment.date.strftime('%d.%m.%Y %H:%M') + '): ' +
+                                             comment.text.replace(",", " ")
+                                             for comment
+                                             in form_response.visible_comment_list])}
+    row.update(meta_data)
+    return row
+
+
+def iter_form_csv(form, investigation_slug, build_absolute_uri, filter_params=None):
+    """ yields the CSV export of a form line by line
+
+    The header is built from the form's instances and the responses
+    are read through a server-side cursor in a single pass so memory
+    usage does not grow with the number of responses. Everything else
+    a row needs is fetched in bulk per chunk of responses."""
+    form_instances = {form_instance.id: form_instance
+                      for form_instance
+                      in FormInstance.objects.filter(form_id=form.id).select_related("form__investigation")}
+    # the header is worked out from the schemas up front so
+    # we do not have to look at the responses to build it
+    columns_by_instance = {instance_id: form_instance.csv_columns
+                           for instance_id, form_instance in form_instances.items()}
+
+    fields = {"meta_{}".format(field) for field in META_FIELDS}
+    for columns in columns_by_instance.values():
+        fields.update(columns.values())
+    fieldnames = sorted(fields, key=lambda x: str(x))
+
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames, extrasaction='ignore')
+    yield writer.writerow(dict(zip(fieldnames, fieldnames)))
 
-def create_form_csv(form, investigation_slug, build_absolute_uri, io_object, filter_params={}):
-    form_instances = FormInstance.objects.filter(form_id=form.id)
     responses = FormResponse.objects\
-        .filter(form_instance__form_id=form.id)\
-        .filter(**filter_params)\
+        .filter(form_id=form.id)\
+        .filter(**(filter_params or {}))\
         .order_by("id")\
-        .all()
-
-    extra_fields = {"url", "version", "status",
-                    "submission_date", "id", "tags", "comments"}
-    fields = {"meta_{}".format(field) for field in extra_fields}
-    
-    for form_response in responses:
-        for field in form_response.rendered_fields():
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    for chunk in _chunked(responses, EXPORT_CHUNK_SIZE):
+        _load_related(chunk, form_instances)
+        for form_response in chunk:
             try:
-                if field['label'] != None and field['label'] != '':
-                    fields.add(field['label'])
-                else:
-                    try:
-                        if field['title'] != None and field['title'] != '':
-                            fields.add(field['title'])
-                        else:
-                            fields.add(field['json_name'])
-                    except:
-                        fields.add(field['json_name'])
-            except:
-                try:
-                    if field['title'] != None and field['title'] != '':
-                        fields.add(field['title'])
-                    else:
-                        fields.add(field['json_name'])
-                except:
-                    fields.add(field['json_name'])
-
-    writer = csv.DictWriter(io_object, fieldnames=sorted(
-        fields, key=lambda x: str(x)), extrasaction='ignore')
-    writer.writeheader()
-
-    for form_response in responses:
-        try:
-            row = {}
-            for field in form_response.rendered_fields():
-                if field['type'] == "link":
-                    row[field["json_name"]] = build_absolute_uri(
-                        field["value"])
-                else:
-                    try:
-                        if field['label'] != None and field['label'] != '':
-                            row[field["label"]] = field["value"]
-                        else:
-                            try:
-                                if field['title'] != None and field['title'] != '':
-                                    row[field["title"]] = field["value"]
-                                else:
-                                    row[field["json_name"]] = field["value"]
-                            except:
-                                row[field["json_name"]] = field["value"]
-                    except:
-                        try:
-                            if field['title'] != None and field['title'] != '':
-                                row[field["title"]] = field["value"]
-                            else:
-                                row[field["json_name"]] = field["value"]
-                        except:
-                            row[field["json_name"]] = field["value"]
-
-            path = reverse("response_details", kwargs={"investigation_slug": investigation_slug,
-                                                        "form_slug": form.slug,
-                                                        "response_id": form_response.id})
-            url = build_absolute_uri(path)
-            meta_data = {"meta_version": form_response.form_instance.version,
-                            "meta_id": form_response.id,
-                            "meta_url": url,
-                            "meta_status": form_response.get_status_display(),
-                            "meta_submission_date": form_response.submission_date,
-                            "meta_tags": ", ".join([tag.name.replace(",", " ")
-                                                    for tag
-                                                    in form_response.tags.all()]),
-                            "meta_comments": ", ".join([comment.author.first_name + ' ' + comment.author.last_name + ' (' +  comment.date.strftime('%d.%m.%Y %H:%M') + '): ' 
-                                                        + comment.text.replace(",", " ")
-                                                    for comment
-                                                    in form_response.visible_comments])}
-            row.update(meta_data)
-
-            writer.writerow(row)
-
-        except TypeError as e:
-            bugsnag.notify(e)
-            print("Skipping row")
-        except KeyError as e:
-            bugsnag.notify(e)
-            print("Skipping row")
+                row = _get_row(form_response, investigation_slug, form.slug,
+                               columns_by_instance[form_response.form_instance_id],
+                               build_absolute_uri)
+                yield writer.writerow(row)
+            except TypeError as e:
+                bugsnag.notify(e)
+                logger.warning("Skipping response %s in the export of %s", form_response.id, form.slug)
+            except KeyError as e:
+                bugsnag.notify(e)
+                logger.warning("Skipping response %s in the export of %s", form_response.id, form.slug)
+
+
+def create_form_csv(form, investigation_slug, build_absolute_uri, io_object, filter_params={}):
+    for line in iter_form_csv(form, investigation_slug, build_absolute_uri, filter_params):
+        io_object.write(line)
+
+
+def run_export_job(job: ExportJob):
+    """ writes the CSV of an export job to a file in the media storage
+    and keeps track of its progress"""
+    form = job.form
+    filter_params = job.filter_params
+
+    def build_absolute_uri(path):
+        return urljoin(job.base_url, path)
+
+    try:
+        job.total = FormResponse.objects \
+            .filter(form_id=form.id) \
+            .filter(**filter_params) \
+            .count()
+        job.save()
+
+        with tempfile.TemporaryFile(mode="w+", encoding="utf-8", newline="") as csv_file:
+            lines = iter_form_csv(form, form.investigation.slug, build_absolute_uri, filter_params)
+            for index, line in enumerate(lines):
+                csv_file.write(line)
+                # the first line is the header
+                if index and index % EXPORT_CHUNK_SIZE == 0:
+                    ExportJob.objects.filter(id=job.id).update(progress=index, heartbeat_date=timezone.now())
+
+            csv_file.seek(0)
+            filename = "crowdnewsroom_download_{}_{}_{}.csv".format(
+                form.investigation.slug, form.slug, uuid.uuid4().hex)
+            job.file.save(filename, File(csv_file), save=False)
+
+        job.progress = job.total
+        job.status = "F"
+    except Exception as e:
+        bugsnag.notify(e)
+        job.status = "E"
+    job.finished_date = timezone.now()
+    job.save()
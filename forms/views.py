@@ -1,24 +1,48 @@
 import datetime
+import hashlib
+import json
 import uuid
 
 from django.conf import settings
 from django.contrib.auth.forms import PasswordResetForm
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import IntegrityError
-from django.http import Http404, HttpResponse
-from django.utils import timezone
+from django.db.models import Q, prefetch_related_objects
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from django.utils.text import compress_string
+from django.utils.translation import get_language
 from rest_framework import generics, permissions, serializers, status
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.generics import get_object_or_404
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import DjangoObjectPermissions, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.serializers import ModelSerializer
+from rest_framework.utils.encoders import JSONEncoder
 
+from .admin_views import _get_api_filter_params, count_facets
+from .attachments import save_with_attachments
 from .fields import Base64ImageField
-from .models import (INVESTIGATION_ROLES, Form, FormInstance,
-                     FormInstanceTemplate, FormResponse, Investigation,
-                     Invitation, Tag, User, UserGroup)
+from .models import (INVESTIGATION_ROLES, ChangeHorizon, ExportJob, Form,
+                     FormInstance, FormInstanceTemplate, FormResponse,
+                     Investigation, Invitation, Tag, User, UserGroup,
+                     latest_form_instances)
+from .utils import EXPORT_CHUNK_SIZE, _chunked
+
+try:
+    import brotli
+except ImportError:  # optional, public forms are only gzipped without it
+    brotli = None
+
+# how long clients and proxies may use the latest form without asking again
+PUBLIC_FORM_MAX_AGE = 60
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
 
 
 class InvestigationSerializer(ModelSerializer):
@@ -103,9 +127,31 @@ class FormInstanceSerializer(ModelSerializer):
         return super().save(*args, **kwargs)
 
 
+def _accepted_encodings(request):
+    """ the content codings the client accepts, leaving out those refused with q=0 """
+    encodings = set()
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        coding, _, params = part.partition(";")
+        params = params.replace(" ", "").lower()
+        try:
+            if params.startswith("q=") and float(params[2:]) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
 class FormInstanceDetail(generics.RetrieveAPIView):
+    """ the latest version of a form, which is what respondents load. The
+    rendered JSON is cached per form, compressed ahead of time and can be
+    revalidated with its ETag. Its response points to a URL that stays the
+    same as long as the version does, so that one can be cached for good """
     serializer_class = FormInstanceSerializer
     lookup_url_kwarg = "form_slug"
+    # public and the same for everybody, do not touch the session
+    authentication_classes = ()
+    cache_control = "public, max-age={}".format(PUBLIC_FORM_MAX_AGE)
 
     def get_object(self, *args, **kwargs):
         form_slug = self.kwargs.get("form_slug")
@@ -114,6 +160,71 @@ class FormInstanceDetail(generics.RetrieveAPIView):
             raise Http404
         return form_instance
 
+    def _render_payload(self):
+        form_instance = self.get_object()
+        body = JSONRenderer().render(self.get_serializer(form_instance).data)
+        digest = hashlib.sha256(body).hexdigest()
+        bodies = {"identity": body, "gzip": compress_string(body)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body)
+        return {
+            "bodies": bodies,
+            "digest": digest,
+            "version_key": "{}-{}".format(form_instance.version, digest[:16]),
+        }
+
+    def get_payload(self):
+        return latest_form_instances.get(self.kwargs.get("form_slug"), self._render_payload)
+
+    def payload_response(self, request, payload):
+        accepted = _accepted_encodings(request)
+        encoding = next((encoding for encoding in ("br", "gzip")
+                         if encoding in accepted and encoding in payload["bodies"]), "identity")
+        # every encoding is a representation of its own with a different tag
+        if encoding == "identity":
+            etag = quote_etag(payload["digest"])
+        else:
+            etag = quote_etag("{}-{}".format(payload["digest"], encoding))
+
+        # no Last-Modified, the payload also changes with its form's settings
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(payload["bodies"][encoding], content_type="application/json")
+            if encoding != "identity":
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Cache-Control"] = self.cache_control
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        payload = self.get_payload()
+        response = self.payload_response(request, payload)
+        response["Content-Location"] = reverse("form_version", kwargs={
+            "investigation_slug": self.kwargs.get("investigation_slug"),
+            "form_slug": self.kwargs.get("form_slug"),
+            "language": get_language(),
+            "version_key": payload["version_key"],
+        })
+        return response
+
+
+class FormInstanceVersionDetail(FormInstanceDetail):
+    """ the latest version of a form under the URL that FormInstanceDetail
+    points to. The URL names the language and the content, so responses never
+    change and can be cached forever. Outdated versions are not found """
+    cache_control = "public, max-age={}, immutable".format(IMMUTABLE_MAX_AGE)
+
+    def retrieve(self, request, *args, **kwargs):
+        language = self.kwargs.get("language")
+        if language not in dict(settings.LANGUAGES):
+            raise Http404
+        with translation.override(language):
+            payload = self.get_payload()
+        if payload["version_key"] != self.kwargs.get("version_key"):
+            raise Http404
+        return self.payload_response(request, payload)
+
 
 class FormResponseSerializer(ModelSerializer):
     class Meta:
@@ -121,10 +232,18 @@ class FormResponseSerializer(ModelSerializer):
         read_only_fields = ("submission_date", "id", "status", "redirect_url")
         fields = ("json", "form_instance") + read_only_fields
 
+    def validate(self, attrs):
+        validator = attrs["form_instance"].schema_validator
+        errors = sorted("{}: {}".format("/".join(str(part) for part in error.path) or "json", error.message)
+                        for error in validator.iter_errors(attrs["json"]))
+        if errors:
+            raise serializers.ValidationError({"json": errors})
+        return attrs
+
     def create(self, validated_data, *args, **kwargs):
         fr = FormResponse(**validated_data)
         fr.submission_date = datetime.datetime.now()
-        fr.save()
+        save_with_attachments(fr)
         return fr
 
 
@@ -137,7 +256,7 @@ class TagField(serializers.PrimaryKeyRelatedField):
 class AssigneeField(serializers.PrimaryKeyRelatedField):
     def get_queryset(self):
         form_response = self.context['view'].get_object()  # type: FormResponse
-        investigation_users = form_response.form_instance.form.investigation.manager_users
+        investigation_users = form_response.investigation.manager_users
         # We already have a list of all the users here but Django expects us to pass
         # a queryset to the form, not a list of objects so we manually create
         # that query here.
@@ -151,17 +270,19 @@ class FormResponseMetaSerializer(ModelSerializer):
 
     class Meta:
         model = FormResponse
-        exclude = ("json",)
+        exclude = ("json", "search_vector", "change_transaction")
 
 
 def get_investigation(instance):
     """ returns this objects related investigation (used for authentication)"""
     if isinstance(instance, FormResponse):
-        return instance.form_instance.form.investigation
+        return instance.investigation
     if isinstance(instance, Tag):
         return instance.investigation
     if isinstance(instance, Form):
         return instance.investigation
+    if isinstance(instance, ExportJob):
+        return instance.form.investigation
 
 
 class CanEditInvestigation(permissions.BasePermission):
@@ -170,6 +291,12 @@ class CanEditInvestigation(permissions.BasePermission):
         return request.user.has_perm("admin_investigation", investigation)
 
 
+class CanManageInvestigation(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        investigation = get_investigation(obj)
+        return request.user.has_perm("manage_investigation", investigation)
+
+
 class FormResponseDetail(generics.RetrieveUpdateAPIView):
     lookup_url_kwarg = "response_id"
     serializer_class = FormResponseMetaSerializer
@@ -580,21 +707,204 @@ class FormResponseListSerializer(ModelSerializer):
 
     class Meta:
         model = FormResponse
-        fields = "__all__"
+        exclude = ("search_vector", "change_transaction")
 
     def get_json(self, form_response):
-        return {field["json_name"]: field["value"] for field in form_response.rendered_fields()}
+        only = self.context.get("json_fields")
+        return {field["json_name"]: field["value"] for field in form_response.rendered_fields(only=only)}
+
+
+class FormResponseCursorPagination(CursorPagination):
+    ordering = ("submission_date", "id")
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        # search results come with the most relevant first
+        if request.query_params.get("q"):
+            return ("-search_rank", "-id")
+        return super().get_ordering(request, queryset, view)
 
 
 class FormResponseList(generics.ListAPIView):
     serializer_class = FormResponseListSerializer
     permission_classes = (IsAuthenticated, ResponseListPermission)
+    pagination_class = FormResponseCursorPagination
 
     def get_queryset(self):
         form_slug = self.kwargs.get("form_slug")
-        queryset = FormResponse.objects.filter(
-            form_instance__form__slug=form_slug)
+        queryset = FormResponse.objects.filter(form__slug=form_slug)
         status = self.request.query_params.get('status', None)
         if status is not None:
             queryset = queryset.filter(status=status)
-        return queryset
+        search = self.request.query_params.get('q')
+        if search:
+            language = get_object_or_404(Form, slug=form_slug).language
+            queryset = queryset.search(search, language)
+        return queryset \
+            .select_related("form_instance__form__investigation") \
+            .prefetch_related("tags", "assignees")
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields = self.request.query_params.get("fields")
+        if fields:
+            context["json_fields"] = set(fields.split(","))
+        return context
+
+
+def parse_change_cursor(cursor):
+    """ returns the transaction and sequence number of a `FormResponseChanges`
+    cursor, raises a ValueError if it is not one """
+    transaction, _, sequence = cursor.rpartition(".")
+    return int(transaction or 0), int(sequence)
+
+
+class FormResponseChanges(FormResponseList):
+    """
+    Responses that were created or changed after the `since` cursor in
+    the order they changed. Clients pass the returned `cursor` back
+    as `since` until `has_more` is false.
+
+    Changes are ordered by the transaction that made them, changes of
+    transactions that may still be running are only returned once every
+    transaction before them finished, so none are skipped.
+    """
+    pagination_class = None
+    max_limit = 1000
+
+    def list(self, request, *args, **kwargs):
+        try:
+            since = request.query_params.get("since", "0")
+            change_transaction, change_sequence = parse_change_cursor(since)
+            limit = int(request.query_params.get("limit", 100))
+        except ValueError:
+            return Response({"detail": "since and limit need to be numbers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= self.max_limit:
+            return Response({"detail": "limit needs to be between 1 and {}".format(self.max_limit)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # the first condition only narrows the index range to scan
+        form_responses = list(self.get_queryset()
+                              .filter(change_transaction__lt=ChangeHorizon())
+                              .filter(change_transaction__gte=change_transaction)
+                              .filter(Q(change_transaction__gt=change_transaction) |
+                                      Q(change_sequence__gt=change_sequence))
+                              .order_by("change_transaction", "change_sequence")[:limit + 1])
+        has_more = len(form_responses) > limit
+        form_responses = form_responses[:limit]
+
+        if form_responses:
+            last = form_responses[-1]
+            since = "{}.{}".format(last.change_transaction, last.change_sequence)
+        return Response({
+            "results": self.get_serializer(form_responses, many=True).data,
+            "cursor": since,
+            "has_more": has_more,
+        })
+
+
+class InvestigationResponseChanges(FormResponseChanges):
+    permission_classes = (IsAuthenticated, InvestigationObjectPermissions)
+
+    def get_queryset(self):
+        investigation_slug = self.kwargs.get("investigation_slug")
+        return FormResponse.objects \
+            .filter(investigation__slug=investigation_slug) \
+            .select_related("form_instance__form__investigation") \
+            .prefetch_related("tags", "assignees")
+
+
+class FormResponseStream(FormResponseList):
+    """ all responses of a form as newline delimited JSON, one response per
+    line, read through a server-side cursor so memory usage stays constant """
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        form = get_object_or_404(Form, slug=self.kwargs.get("form_slug"))
+        filter_params = _get_api_filter_params(request.query_params)
+        return StreamingHttpResponse(self._iter_lines(form, filter_params),
+                                     content_type="application/x-ndjson")
+
+    def _iter_lines(self, form, filter_params):
+        form_instances = FormInstance.objects \
+            .filter(form_id=form.id) \
+            .select_related("form__investigation") \
+            .in_bulk()
+        responses = FormResponse.objects \
+            .filter(form_id=form.id) \
+            .filter(**filter_params) \
+            .order_by("id") \
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        for chunk in _chunked(responses, EXPORT_CHUNK_SIZE):
+            for form_response in chunk:
+                form_response.form_instance = form_instances[form_response.form_instance_id]
+            prefetch_related_objects(chunk, "tags", "assignees")
+            for data in self.get_serializer(chunk, many=True).data:
+                yield json.dumps(data, cls=JSONEncoder) + "\n"
+
+
+class FormResponseFacets(generics.GenericAPIView):
+    """ the number of responses per status, tag and assignee, for the
+    same filters as the response list of the admin interface """
+    permission_classes = (IsAuthenticated, ResponseListPermission)
+
+    def get(self, request, *args, **kwargs):
+        form = get_object_or_404(Form, slug=self.kwargs.get("form_slug"))
+        params = request.query_params
+        return Response(count_facets(form, _get_api_filter_params(params), params.get("q")))
+
+
+class ExportJobSerializer(ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ("id", "form", "filter_params", "status", "progress", "total",
+                  "created_date", "finished_date", "download_url")
+        read_only_fields = fields
+
+    def get_download_url(self, job):
+        if job.status != "F":
+            return None
+        return reverse("export_file", kwargs={"pk": job.id})
+
+
+class ExportJobCreate(generics.CreateAPIView):
+    serializer_class = ExportJobSerializer
+    permission_classes = (IsAuthenticated, ResponseListPermission)
+
+    def create(self, request, *args, **kwargs):
+        form = get_object_or_404(Form, slug=self.kwargs.get("form_slug"))
+        filter_params = _get_api_filter_params(request.query_params)
+        job, created = ExportJob.get_or_create_for(form, filter_params,
+                                                   request.build_absolute_uri("/"),
+                                                   request.user)
+        serializer = self.get_serializer(job)
+        return Response(serializer.data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class ExportJobDetail(generics.RetrieveAPIView):
+    serializer_class = ExportJobSerializer
+    queryset = ExportJob.objects.select_related("form__investigation")
+    permission_classes = (IsAuthenticated, CanManageInvestigation)
+
+
+class ExportJobFile(generics.RetrieveAPIView):
+    queryset = ExportJob.objects.select_related("form__investigation")
+    permission_classes = (IsAuthenticated, CanManageInvestigation)
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != "F" or not job.file:
+            raise Http404
+        filename = 'crowdnewsroom_download_{}_{}.csv'.format(
+            job.form.investigation.slug, job.form.slug)
+        response = FileResponse(job.file.open("rb"), content_type="text/csv")
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+            filename)
+        return response